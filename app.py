@@ -1,11 +1,16 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, session, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy.orm import joinedload
+from werkzeug.serving import is_running_from_reloader
+from sqlalchemy import insert, inspect, text
+from sqlalchemy.orm import joinedload, load_only
 import pandas as pd
 import os
-from datetime import datetime, timedelta
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from jinja2 import FileSystemBytecodeCache
 from evaluator_selector import get_evaluator_from_config
 from evaluator_config import get_evaluator_config
 from llm_evaluator import LLMEvaluator
@@ -14,6 +19,13 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///exam_system.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Optional cheaper hash method for the seeded dev accounts, e.g. 'pbkdf2:sha256:1'
+app.config['DEV_PASSWORD_HASH_METHOD'] = os.environ.get('DEV_PASSWORD_HASH_METHOD')
+
+# Keep compiled templates on disk so restarted workers don't re-parse every template
+jinja_cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+os.makedirs(jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
 
 db = SQLAlchemy(app)
 login_manager = LoginManager()
@@ -22,25 +34,22 @@ login_manager.login_view = 'login'
 
 # Initialize LLM evaluator as main evaluation engine
 try:
-    llm_evaluator = LLMEvaluator()
+    llm_evaluator = LLMEvaluator(cache_db_path=os.path.join(app.instance_path, 'llm_eval_cache.sqlite'))
+    
+    # The Ollama connection is checked in the background; is_available waits for it where
+    # it matters, so reading it here would block startup (and every worker) on Ollama
+    print(f"🔌 LLM Evaluator connecting to Ollama in the background")
+    print(f"📊 Model: {llm_evaluator.model_name}")
+    print(f"🌐 Ollama URL: {llm_evaluator.ollama_url}")
+    print(f"⚙️  Config: Max retries={llm_evaluator.max_retries}, Timeout={llm_evaluator.timeout}s")
     
-    if llm_evaluator.is_available:
-        print(f"✅ LLM Evaluator initialized successfully")
-        print(f"📊 Model: {llm_evaluator.model_name}")
-        print(f"🌐 Ollama URL: {llm_evaluator.ollama_url}")
-        print(f"⚙️  Config: Max retries={llm_evaluator.max_retries}, Timeout={llm_evaluator.timeout}s")
-    else:
-        print(f"❌ LLM Evaluator not available")
-        print("Please ensure Ollama is running with llama2:7b model:")
-        print("1. Install Ollama: https://ollama.ai/")
-        print("2. Run: ollama serve")
-        print("3. Run: ollama pull llama2:7b")
-        llm_evaluator = None
-        
 except Exception as e:
     print(f"❌ Failed to initialize LLM evaluator: {e}")
     llm_evaluator = None
 
+# Background worker that runs LLM evaluations outside of the request cycle
+evaluation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm-evaluation')
+
 # Database Models
 class Department(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -110,16 +119,26 @@ class Result(db.Model):
     approved_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Admin who approved
     approved_at = db.Column(db.DateTime, nullable=True)  # When it was approved
     final_marks = db.Column(db.Float, nullable=True)  # Final marks after approval
+    evaluation_status = db.Column(db.String(20), default='evaluated')  # 'queued', 'evaluating', 'evaluated' or 'failed'
     
     student = db.relationship('User', backref='results', foreign_keys=[student_id])
     question = db.relationship('Question', backref='results')
     session = db.relationship('ExamSession', backref='results')
     approver = db.relationship('User', backref='approved_results', foreign_keys=[approved_by])
+    
+    # Results are almost always looked up per exam and student
+    __table_args__ = (db.Index('ix_result_exam_student', 'exam_id', 'student_id'),)
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+def get_exam_lite(exam_id):
+    """Get an exam with only its status/timing columns loaded, or 404."""
+    return Exam.query.options(
+        load_only(Exam.id, Exam.title, Exam.is_enabled, Exam.is_active, Exam.duration_minutes)
+    ).get_or_404(exam_id)
+
 # Routes
 @app.route('/')
 def index():
@@ -318,16 +337,20 @@ def upload_csv(exam_id):
         # Clear existing questions
         Question.query.filter_by(exam_id=exam_id).delete()
         
-        # Add new questions
-        for index, row in df.iterrows():
-            question = Question(
-                exam_id=exam_id,
-                question_text=row['question'],
-                reference_answer=row['answer'],
-                max_marks=int(row['max_marks']),
-                question_order=index + 1
-            )
-            db.session.add(question)
+        # Add new questions with one executemany instead of one ORM object per row
+        questions_data = [
+            {
+                'exam_id': exam_id,
+                'question_text': question_text,
+                'reference_answer': reference_answer,
+                'max_marks': int(max_marks),
+                'question_order': order
+            }
+            for order, (question_text, reference_answer, max_marks)
+            in enumerate(zip(df['question'], df['answer'], df['max_marks']), start=1)
+        ]
+        if questions_data:
+            db.session.execute(insert(Question), questions_data)
         
         db.session.commit()
         return jsonify({'message': 'Question bank uploaded successfully!'})
@@ -342,7 +365,7 @@ def toggle_exam(exam_id):
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('admin_dashboard'))
     
-    exam = Exam.query.get_or_404(exam_id)
+    exam = get_exam_lite(exam_id)
     exam.is_enabled = not exam.is_enabled
     db.session.commit()
     
@@ -357,7 +380,7 @@ def start_exam(exam_id):
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('admin_dashboard'))
     
-    exam = Exam.query.get_or_404(exam_id)
+    exam = get_exam_lite(exam_id)
     
     if exam.is_active:
         flash('Exam is already active!', 'warning')
@@ -365,10 +388,15 @@ def start_exam(exam_id):
     
     # Start the exam
     exam.is_active = True
-    exam.start_time = datetime.utcnow()
-    exam.end_time = datetime.utcnow() + timedelta(minutes=exam.duration_minutes)
+    now = datetime.utcnow()
+    exam.start_time = now
+    exam.end_time = now + timedelta(minutes=exam.duration_minutes)
     db.session.commit()
     
+    # Embed the reference answers now rather than on the first submission
+    if llm_evaluator is not None and llm_evaluator.primary_filter is not None:
+        evaluation_executor.submit(cache_reference_embeddings, exam_id)
+    
     flash(f'Exam "{exam.title}" started successfully! Duration: {exam.duration_minutes} minutes', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -379,21 +407,22 @@ def stop_exam(exam_id):
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('admin_dashboard'))
     
-    exam = Exam.query.get_or_404(exam_id)
+    exam = get_exam_lite(exam_id)
     
     if not exam.is_active:
         flash('Exam is not currently active!', 'warning')
         return redirect(url_for('admin_dashboard'))
     
     # Stop the exam
+    now = datetime.utcnow()
     exam.is_active = False
-    exam.end_time = datetime.utcnow()
+    exam.end_time = now
     
     # Mark all active sessions as completed
     active_sessions = ExamSession.query.filter_by(exam_id=exam_id, is_completed=False).all()
     for session in active_sessions:
         session.is_completed = True
-        session.end_time = datetime.utcnow()
+        session.end_time = now
     
     db.session.commit()
     
@@ -557,6 +586,10 @@ def approve_evaluation():
         
         result = Result.query.get_or_404(result_id)
         
+        # The background evaluation would overwrite the score after approval
+        if result.evaluation_status in ('queued', 'evaluating'):
+            return jsonify({'error': 'This answer is still being evaluated. Please try again shortly.'}), 400
+        
         # Update the result with admin approval
         result.is_approved = True
         result.approved_by = current_user.id
@@ -592,7 +625,7 @@ def bulk_approve_evaluation():
             exam_id=exam_id,
             student_id=student_id,
             is_approved=False
-        ).all()
+        ).filter(Result.evaluation_status.notin_(['queued', 'evaluating'])).all()
         
         approved_count = 0
         for result in results:
@@ -694,16 +727,21 @@ def student_dashboard():
                          available_exams=available_exams,
                          completed_exams=completed_exams)
 
+def session_minutes_elapsed(exam_session):
+    """Minutes elapsed since an exam session started."""
+    # start_time is stored as naive UTC
+    return (time.time() - exam_session.start_time.replace(tzinfo=timezone.utc).timestamp()) / 60
+
 def auto_submit_exam_answers(exam_id, student_id, session_id):
     """Auto-submit exam answers when time expires."""
     try:
-        # Check if already submitted
-        existing_result = Result.query.filter_by(
+        # Check if already submitted (only existence matters, so no full row is loaded)
+        already_submitted = db.session.query(Result.id).filter_by(
             exam_id=exam_id, 
             student_id=student_id
-        ).first()
+        ).first() is not None
         
-        if existing_result:
+        if already_submitted:
             return  # Already submitted
         
         # Get exam and questions
@@ -752,7 +790,8 @@ def take_exam(exam_id):
         return redirect(url_for('student_dashboard'))
     
     # Check if exam time has expired
-    if exam.end_time and datetime.utcnow() > exam.end_time:
+    now = datetime.utcnow()
+    if exam.end_time and now > exam.end_time:
         flash('This exam has already ended.', 'error')
         return redirect(url_for('student_dashboard'))
     
@@ -768,13 +807,12 @@ def take_exam(exam_id):
             return redirect(url_for('view_results', exam_id=exam_id))
         else:
             # Continue existing session
-            time_elapsed = (datetime.utcnow() - existing_session.start_time).total_seconds() / 60
-            time_remaining = max(0, exam.duration_minutes - time_elapsed)
+            time_remaining = max(0, exam.duration_minutes - session_minutes_elapsed(existing_session))
             
             if time_remaining <= 0:
                 # Time expired, auto-submit the exam
                 existing_session.is_completed = True
-                existing_session.end_time = datetime.utcnow()
+                existing_session.end_time = now
                 
                 # Auto-submit any answers that were provided
                 auto_submit_exam_answers(exam_id, current_user.id, existing_session.id)
@@ -787,17 +825,22 @@ def take_exam(exam_id):
         existing_session = ExamSession(
             exam_id=exam_id,
             student_id=current_user.id,
-            start_time=datetime.utcnow()
+            start_time=now
         )
         db.session.add(existing_session)
         db.session.commit()
         
         time_remaining = exam.duration_minutes
     
-    questions = Question.query.filter_by(exam_id=exam_id).order_by(Question.question_order).all()
-    return render_template('exam_interface.html', 
+    # Stream the page and fetch questions lazily so long exams are not buffered in memory
+    question_count = Question.query.filter_by(exam_id=exam_id).count()
+    questions = Question.query.filter_by(exam_id=exam_id).options(
+        load_only(Question.id, Question.question_text, Question.max_marks, Question.question_order)
+    ).order_by(Question.question_order).yield_per(50)
+    return stream_template('exam_interface.html', 
                          exam=exam, 
                          questions=questions,
+                         question_count=question_count,
                          session=existing_session,
                          time_remaining=int(time_remaining))
 
@@ -808,7 +851,7 @@ def get_exam_time_remaining(exam_id):
     if current_user.role != 'student':
         return jsonify({'error': 'Access denied'}), 403
     
-    exam = Exam.query.get_or_404(exam_id)
+    exam = get_exam_lite(exam_id)
     
     # Check if exam is active
     if not exam.is_active:
@@ -825,8 +868,7 @@ def get_exam_time_remaining(exam_id):
         return jsonify({'error': 'No active session'}), 400
     
     # Calculate remaining time
-    time_elapsed = (datetime.utcnow() - existing_session.start_time).total_seconds() / 60
-    time_remaining = max(0, exam.duration_minutes - time_elapsed)
+    time_remaining = max(0, exam.duration_minutes - session_minutes_elapsed(existing_session))
     
     return jsonify({
         'time_remaining': int(time_remaining),
@@ -841,97 +883,193 @@ def submit_exam():
         return jsonify({'error': 'Access denied'}), 403
     
     exam_id = request.form.get('exam_id')
-    exam = Exam.query.get_or_404(exam_id)
+    exam = get_exam_lite(exam_id)
     
     if not exam.is_enabled:
         return jsonify({'error': 'Exam not available'}), 400
     
-    # Check if already submitted
-    existing_result = Result.query.filter_by(
+    # Check if already submitted (only existence matters, so no full row is loaded)
+    already_submitted = db.session.query(Result.id).filter_by(
         exam_id=exam_id, 
         student_id=current_user.id
-    ).first()
+    ).first() is not None
     
-    if existing_result:
+    if already_submitted:
         return jsonify({'error': 'Exam already submitted'}), 400
     
     try:
         questions = Question.query.filter_by(exam_id=exam_id).all()
         
+        # Partition questions into unanswered and answered ones
+        empty_questions = []
+        answered_questions = []
         for question in questions:
             student_answer = request.form.get(f'answer_{question.id}', '')
-            
-            if student_answer.strip():
-                # Check if LLM evaluator is available
-                if llm_evaluator is None or not llm_evaluator.is_available:
-                    return jsonify({'error': 'LLM Evaluator not available. Please contact administrator.'}), 500
-                
-                try:
-                    # Evaluate using LLM evaluator
-                    evaluation_result = llm_evaluator.evaluate(
-                        student_answer=student_answer,
-                        reference_answer=question.reference_answer,
-                        question=question.question_text,
-                        max_marks=question.max_marks
-                    )
-                    
-                    # Extract LLM evaluation details
-                    llm_score = evaluation_result['final_score']
-                    details = evaluation_result['details']
-                    explanation = evaluation_result.get('explanation', 'No explanation provided')
-                    
-                    # Log evaluation details
-                    print(f"🔍 Question {question.id} LLM Evaluation:")
-                    print(f"   📊 LLM Score: {llm_score:.2f}/{question.max_marks}")
-                    print(f"   💭 Explanation: {explanation}")
-                    print(f"   🤖 Model: {details.get('model_name', 'Unknown')}")
-                    
-                    # Save result with LLM evaluation (pending admin approval)
-                    result = Result(
-                        exam_id=exam_id,
-                        student_id=current_user.id,
-                        question_id=question.id,
-                        student_answer=student_answer,
-                        ai_score=0.0,  # Legacy field, not used in LLM workflow
-                        marks_awarded=0.0,  # Will be set after admin approval
-                        llm_score=llm_score,
-                        llm_explanation=explanation,
-                        is_approved=False,  # Pending admin approval
-                        final_marks=None  # Will be set after approval
-                    )
-                    db.session.add(result)
-                    
-                except Exception as e:
-                    print(f"❌ LLM evaluation failed for question {question.id}: {str(e)}")
-                    return jsonify({'error': f'LLM evaluation failed: {str(e)}'}), 500
+            if student_answer and not student_answer.isspace():
+                answered_questions.append((question, student_answer))
             else:
-                # Save empty answer
-                result = Result(
-                    exam_id=exam_id,
-                    student_id=current_user.id,
-                    question_id=question.id,
-                    student_answer="",
-                    ai_score=0.0,
-                    marks_awarded=0.0,
-                    llm_score=0.0,
-                    llm_explanation="No answer provided",
-                    is_approved=False,
-                    final_marks=None
-                )
-                db.session.add(result)
+                empty_questions.append(question)
+        
+        # Empty answers need no evaluation - save them in a single bulk insert
+        empty_rows = [{
+            'exam_id': exam_id,
+            'student_id': current_user.id,
+            'question_id': question.id,
+            'student_answer': "",
+            'ai_score': 0.0,
+            'marks_awarded': 0.0,
+            'llm_score': 0.0,
+            'llm_explanation': "No answer provided",
+            'is_approved': False,
+            'final_marks': None
+        } for question in empty_questions]
+        
+        # Answered questions are queued and evaluated by the LLM in the background
+        if answered_questions and (llm_evaluator is None or not llm_evaluator.is_available):
+            return jsonify({'error': 'LLM Evaluator not available. Please contact administrator.'}), 500
+        
+        answered_rows = [{
+            'exam_id': exam_id,
+            'student_id': current_user.id,
+            'question_id': question.id,
+            'student_answer': student_answer,
+            'ai_score': 0.0,  # Legacy field, not used in LLM workflow
+            'marks_awarded': 0.0,  # Will be set after admin approval
+            'llm_score': None,  # Set by the background evaluation
+            'llm_explanation': None,
+            'is_approved': False,  # Pending admin approval
+            'final_marks': None,  # Will be set after approval
+            'evaluation_status': 'queued'
+        } for question, student_answer in answered_questions]
+        
+        if empty_rows:
+            db.session.execute(insert(Result), empty_rows)
+        if answered_rows:
+            db.session.execute(insert(Result), answered_rows)
         
         db.session.commit()
         
+        if answered_rows:
+            evaluation_executor.submit(evaluate_queued_results, int(exam_id), current_user.id)
+        
         return jsonify({
             'message': 'Exam submitted successfully! Your answers are being evaluated by AI and will be reviewed by the administrator.',
             'status': 'pending_review',
             'redirect_url': url_for('view_results', exam_id=exam_id)
-        })
+        }), 202
     
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Error submitting exam: {str(e)}'}), 500
 
+def cache_reference_embeddings(exam_id):
+    """Pre-compute the primary filter embeddings of an exam's reference answers (runs on the background worker)."""
+    with app.app_context():
+        try:
+            reference_answers = [
+                reference_answer for (reference_answer,) in
+                db.session.query(Question.reference_answer).filter_by(exam_id=exam_id)
+            ]
+            llm_evaluator.primary_filter.cache_reference_embeddings(reference_answers)
+            print(f"✅ Cached {len(reference_answers)} reference answer embeddings for exam {exam_id}")
+        except Exception as e:
+            print(f"⚠️ Could not cache reference answer embeddings for exam {exam_id}: {str(e)}")
+
+def evaluate_queued_results(exam_id, student_id):
+    """Evaluate a student's queued answers with the LLM (runs on the background worker)."""
+    with app.app_context():
+        try:
+            results = Result.query.filter_by(
+                exam_id=exam_id,
+                student_id=student_id,
+                evaluation_status='queued'
+            ).options(db.joinedload(Result.question)).order_by(Result.question_id).all()
+            
+            if not results:
+                return
+            
+            # Check availability once per submission rather than per answer, and mark
+            # the answers as failed so the admin can see and grade them by hand
+            if llm_evaluator is None or not llm_evaluator.is_available:
+                print(f"❌ LLM Evaluator not available, marking exam {exam_id} answers of student {student_id} as failed")
+                for result in results:
+                    result.llm_score = 0.0
+                    result.llm_explanation = 'LLM evaluation failed: LLM Evaluator not available'
+                    result.evaluation_status = 'failed'
+                db.session.commit()
+                return
+            
+            # Mark as evaluating so the admin UI can show progress
+            for result in results:
+                result.evaluation_status = 'evaluating'
+            db.session.commit()
+            
+            # Evaluate all answers of the submission concurrently
+            try:
+                evaluation_results = llm_evaluator.evaluate_batch([{
+                    'student_answer': result.student_answer,
+                    'reference_answer': result.question.reference_answer,
+                    'question': result.question.question_text,
+                    'max_marks': result.question.max_marks
+                } for result in results])
+            except Exception as e:
+                print(f"❌ LLM batch evaluation failed for exam {exam_id}, student {student_id}: {str(e)}")
+                for result in results:
+                    result.llm_score = 0.0
+                    result.llm_explanation = f'LLM evaluation failed: {str(e)}'
+                    result.evaluation_status = 'failed'
+                db.session.commit()
+                return
+            
+            for result, evaluation_result in zip(results, evaluation_results):
+                question = result.question
+                
+                # Extract LLM evaluation details
+                llm_score = evaluation_result.get('final_score', 0.0)
+                details = evaluation_result['details']
+                explanation = evaluation_result.get('explanation', 'No explanation provided')
+                
+                # Log evaluation details
+                print(f"🔍 Question {question.id} LLM Evaluation:")
+                print(f"   📊 LLM Score: {llm_score:.2f}/{question.max_marks}")
+                print(f"   💭 Explanation: {explanation}")
+                print(f"   🤖 Model: {details.get('model_name', 'Unknown')}")
+                
+                result.llm_score = llm_score
+                result.llm_explanation = explanation
+                result.evaluation_status = 'evaluated'
+            
+            db.session.commit()
+        
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Background evaluation failed for exam {exam_id}, student {student_id}: {str(e)}")
+
+def resume_interrupted_evaluations():
+    """Re-queue evaluations cut off by a restart and hand all queued submissions to the background worker.
+    
+    The evaluation queue only lives in this process's memory, so rows left 'queued'
+    or 'evaluating' by a previous process are otherwise never picked up again.
+    """
+    if llm_evaluator is None or not llm_evaluator.is_available:
+        print("⚠️ LLM Evaluator not available, queued evaluations will be resumed on the next start")
+        return
+    
+    with app.app_context():
+        interrupted_count = Result.query.filter_by(evaluation_status='evaluating').update(
+            {Result.evaluation_status: 'queued'}, synchronize_session=False
+        )
+        db.session.commit()
+        submissions = db.session.query(Result.exam_id, Result.student_id).filter_by(
+            evaluation_status='queued'
+        ).distinct().all()
+    
+    for exam_id, student_id in submissions:
+        evaluation_executor.submit(evaluate_queued_results, exam_id, student_id)
+    
+    if submissions:
+        print(f"🔁 Resumed {len(submissions)} queued submissions ({interrupted_count} answers were interrupted mid-evaluation)")
+
 @app.route('/student/results/<int:exam_id>')
 @login_required
 def view_results(exam_id):
@@ -984,64 +1122,59 @@ if __name__ == '__main__':
     with app.app_context():
         db.create_all()
         
-        # Create default departments
+        # create_all never alters existing tables, so add columns introduced since
+        result_columns = {column['name'] for column in inspect(db.engine).get_columns('result')}
+        if 'evaluation_status' not in result_columns:
+            db.session.execute(text(
+                "ALTER TABLE result ADD COLUMN evaluation_status VARCHAR(20) DEFAULT 'evaluated'"
+            ))
+        db.session.query(Result).filter(Result.evaluation_status.is_(None)).update(
+            {Result.evaluation_status: 'evaluated'}, synchronize_session=False
+        )
+        db.session.commit()
+        
+        # create_all only adds indexes along with new tables
+        for index in Result.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        
+        # Create default departments, only if no departments exist at all
         departments_data = [
             {'name': 'ITS', 'description': 'ITS'},
             {'name': 'LTS', 'description': 'LTS'},
             {'name': 'BLS', 'description': 'BLS'},
             {'name': 'LES', 'description': 'LES'}
         ]
+        if db.session.query(Department.id).first() is None:
+            db.session.execute(insert(Department), departments_data)
         
-        # Only create if no departments exist at all
-        if Department.query.count() == 0:
-            for dept_data in departments_data:
-                dept = Department(name=dept_data['name'], description=dept_data['description'])
-                db.session.add(dept)
-        
-        db.session.commit()
-        
-        # Get departments for assigning students
-        its_dept = Department.query.filter_by(name='ITS').first()
-        lts_dept = Department.query.filter_by(name='LTS').first()
-        bls_dept = Department.query.filter_by(name='BLS').first()
-        les_dept = Department.query.filter_by(name='LES').first()
+        # Get department ids for assigning students
+        department_ids = dict(db.session.query(Department.name, Department.id).all())
         
-        # Ensure default users exist
-        admin_user = User.query.filter_by(role='admin').first()
-        if not admin_user:
-            admin_user = User(
-                username='admin',
-                password=generate_password_hash('admin123'),
-                role='admin'
-            )
-            db.session.add(admin_user)
+        # Default users - admin (only if there is no admin at all) plus 2 students in each department (8 total)
+        users_data = []
+        if db.session.query(User.id).filter_by(role='admin').first() is None:
+            users_data.append({'username': 'admin', 'password': 'admin123', 'role': 'admin', 'department_id': None})
+        for dept_name in ('ITS', 'LTS', 'BLS', 'LES'):
+            for number in (1, 2):
+                username = f'{dept_name.lower()}{number}'
+                users_data.append({
+                    'username': username,
+                    'password': f'{username}123',
+                    'role': 'student',
+                    'department_id': department_ids.get(dept_name)
+                })
         
-        # Create students - 2 in each department (8 total)
-        students_data = [
-            # ITS Department
-            {'username': 'its1', 'dept': its_dept},
-            {'username': 'its2', 'dept': its_dept},
-            # LTS Department  
-            {'username': 'lts1', 'dept': lts_dept},
-            {'username': 'lts2', 'dept': lts_dept},
-            # BLS Department
-            {'username': 'bls1', 'dept': bls_dept},
-            {'username': 'bls2', 'dept': bls_dept},
-            # LES Department
-            {'username': 'les1', 'dept': les_dept},
-            {'username': 'les2', 'dept': les_dept}
+        # Only hash passwords for users that are actually missing
+        existing_usernames = {username for (username,) in db.session.query(User.username)}
+        hash_method = app.config['DEV_PASSWORD_HASH_METHOD']
+        hash_options = {'method': hash_method} if hash_method else {}
+        new_users = [
+            dict(user_data, password=generate_password_hash(user_data['password'], **hash_options))
+            for user_data in users_data
+            if user_data['username'] not in existing_usernames
         ]
-        
-        for student_data in students_data:
-            username = student_data['username']
-            dept = student_data['dept']
-            if not User.query.filter_by(username=username).first():
-                db.session.add(User(
-                    username=username,
-                    password=generate_password_hash(f'{username}123'),
-                    role='student',
-                    department_id=dept.id if dept else None
-                ))
+        if new_users:
+            db.session.execute(insert(User), new_users)
         
         db.session.commit()
         print("Default departments and users ensured:")
@@ -1053,4 +1186,8 @@ if __name__ == '__main__':
         print("  BLS: bls1/bls1123, bls2/bls2123")
         print("  LES: les1/les1123, les2/les2123")
     
+    # app.run uses the reloader, only resume in the child process that actually serves requests
+    if is_running_from_reloader():
+        resume_interrupted_evaluations()
+    
     app.run(debug=True, host='0.0.0.0', port=5002)
@@ -24,6 +24,8 @@ class Config:
     # Security Configuration
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
     SESSION_COOKIE_HTTPONLY = True
+    # Cheaper hash method for seeded dev/test accounts only (e.g. 'pbkdf2:sha256:1')
+    DEV_PASSWORD_HASH_METHOD = os.environ.get('DEV_PASSWORD_HASH_METHOD')
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
     
     # Application Configuration
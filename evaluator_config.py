@@ -9,6 +9,8 @@ MODEL_NAME = "llama2:latest"  # Model to use for evaluation
 MAX_RETRIES = 3  # Maximum retries for API calls
 TIMEOUT = 60  # Timeout for API calls in seconds
 SAS_THRESHOLD = 0.15  # SAS similarity threshold for quality filtering
+CACHE_DB_PATH = "~/.llm_eval_cache.sqlite"  # Persistent LLM response cache (None to disable)
+CACHE_TTL_DAYS = 30  # Days before cached LLM responses expire
 
 # Logging Configuration
 LOG_EVALUATIONS = True  # Log evaluation results for analysis
@@ -34,6 +36,8 @@ def get_evaluator_config():
         "max_retries": MAX_RETRIES,
         "timeout": TIMEOUT,
         "sas_threshold": SAS_THRESHOLD,
+        "cache_db_path": CACHE_DB_PATH,
+        "cache_ttl_days": CACHE_TTL_DAYS,
         "log_evaluations": LOG_EVALUATIONS,
         "log_detailed_breakdown": LOG_DETAILED_BREAKDOWN,
         "default_evaluator_type": DEFAULT_EVALUATOR_TYPE,
@@ -42,7 +46,7 @@ def get_evaluator_config():
 
 def update_config(**kwargs):
     """Update configuration settings."""
-    global OLLAMA_URL, MODEL_NAME, MAX_RETRIES, TIMEOUT, SAS_THRESHOLD, LOG_EVALUATIONS, LOG_DETAILED_BREAKDOWN, DEFAULT_EVALUATOR_TYPE, EVALUATION_THRESHOLDS
+    global OLLAMA_URL, MODEL_NAME, MAX_RETRIES, TIMEOUT, SAS_THRESHOLD, CACHE_DB_PATH, CACHE_TTL_DAYS, LOG_EVALUATIONS, LOG_DETAILED_BREAKDOWN, DEFAULT_EVALUATOR_TYPE, EVALUATION_THRESHOLDS
     
     for key, value in kwargs.items():
         if key == "ollama_url":
@@ -55,6 +59,10 @@ def update_config(**kwargs):
             TIMEOUT = value
         elif key == "sas_threshold":
             SAS_THRESHOLD = value
+        elif key == "cache_db_path":
+            CACHE_DB_PATH = value
+        elif key == "cache_ttl_days":
+            CACHE_TTL_DAYS = value
         elif key == "log_evaluations":
             LOG_EVALUATIONS = value
         elif key == "log_detailed_breakdown":
@@ -49,13 +49,17 @@ def _initialize_llm_evaluator(config: dict) -> LLMEvaluator:
         max_retries = config.get('max_retries', 3)
         timeout = config.get('timeout', 60)
         sas_threshold = config.get('sas_threshold', 0.15)
+        cache_db_path = config.get('cache_db_path', '~/.llm_eval_cache.sqlite')
+        cache_ttl_days = config.get('cache_ttl_days', 30)
         
         evaluator = LLMEvaluator(
             ollama_url=ollama_url,
             model_name=model_name,
             max_retries=max_retries,
             timeout=timeout,
-            sas_threshold=sas_threshold
+            sas_threshold=sas_threshold,
+            cache_db_path=cache_db_path,
+            cache_ttl_days=cache_ttl_days
         )
         
         logger.info("LLMEvaluator initialized successfully")
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Gunicorn configuration for running the exam system in production
+
+Usage:
+    gunicorn -c gunicorn_conf.py app:app
+"""
+
+import os
+
+# Server socket
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5002')
+
+# Worker processes - few of them, since each one holds its own embedding model (~420 MB)
+# and evaluator caches; concurrency comes from threads, so a slow LLM call only holds one
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# LLM evaluations can take a while, keep this above the Ollama timeout
+timeout = 120
+
+# Each worker imports the app itself. LLMEvaluator starts background threads and opens
+# an HTTP session and a SQLite cache at import, none of which survive a fork
+preload_app = False
+
+# Logging
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """Resume evaluations interrupted by the last shutdown, once per server start."""
+    # The evaluation queue lives in each worker's memory; only the first worker
+    # picks up leftover work so answers are not evaluated twice
+    if worker.age == 1:
+        from app import resume_interrupted_evaluations
+        resume_interrupted_evaluations()
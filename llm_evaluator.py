@@ -9,11 +9,51 @@ that can be reviewed and approved by administrators.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
-from typing import Dict, Any, Optional, List
+import re
+import string
+import asyncio
+import bisect
+import copy
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
+# httpx is optional - without it batch evaluation falls back to worker threads
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+# HTTP/2 support for httpx needs the optional h2 package
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = HTTPX_AVAILABLE
+except ImportError:
+    H2_AVAILABLE = False
+
+# orjson is optional - a faster drop-in for encoding requests and parsing Ollama responses
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+from llm_response_parser import try_parse_llm_response, split_packed_llm_response
+
 # Try to import PrimaryFilter, but make it optional
 try:
     from optimized_sas_evaluator import PrimaryFilter
@@ -24,15 +64,101 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+if ORJSON_AVAILABLE:
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+# Default location of the persistent LLM response cache
+DEFAULT_CACHE_DB_PATH = "~/.llm_eval_cache.sqlite"
+
+# Matches once the streamed response contains a complete "Reason:" line
+_RE_REASON_LINE = re.compile(r'Reason:[^\n]*\S[^\n]*\n')
+
+# HTTP statuses worth retrying besides 5xx; other 4xx responses fail immediately
+_RETRYABLE_STATUS = frozenset({408, 429})
+
+# Headers for the pre-encoded Ollama request bodies
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Static evaluation instructions shared by the single and packed system prompts,
+# which only differ in the required output format
+_EVALUATION_INSTRUCTIONS = """You are an expert educational evaluator. Evaluate the student's answer based on conceptual understanding and provide a percentage score.
+
+CRITICAL: If the student's answer is completely unrelated to the question topic or shows no understanding, give 0% immediately.
+
+EVALUATION CRITERIA:
+1. Conceptual Accuracy (40%): Core concepts correctly identified and explained
+2. Completeness (30%): Addresses key points from reference answer
+3. Depth & Coverage (15%): Sufficient detail and comprehensive coverage
+4. Clarity & Communication (15%): Clear, well-organized explanation
+
+SCORING GUIDELINES:
+- 90-100%: Excellent understanding, comprehensive coverage
+- 80-89%: Strong understanding, addresses most key points
+- 70-79%: Good understanding, covers main concepts
+- 60-69%: Adequate understanding, partial coverage
+- 50-59%: Basic understanding, significant gaps
+- 40-49%: Limited understanding, major gaps
+- 30-39%: Poor understanding, minimal knowledge
+- 20-29%: Very poor understanding, mostly incorrect
+- 10-19%: Minimal understanding, mostly wrong
+- 0-9%: No understanding, completely incorrect or unrelated
+
+EVALUATION RULES:
+- Focus on CONCEPTUAL UNDERSTANDING, not exact wording
+- Accept equivalent concepts expressed differently
+- Reward comprehensive coverage even if details differ
+- Give 0% for answers showing no understanding of the topic
+- Give 0% for completely unrelated or nonsensical answers
+- Give 0% for answers that are clearly wrong or demonstrate no knowledge
+- Be fair but strict - partial credit only for actual understanding
+- Ignore the similarity score - evaluate independently
+- If answer is unrelated to the question topic, give 0% immediately
+
+"""
+
+# Sent as the Ollama system prompt so the text is identical on every request
+# and only the answers change per call
+EVALUATION_SYSTEM_PROMPT = _EVALUATION_INSTRUCTIONS + """REQUIRED FORMAT (a single JSON object, nothing else):
+{"score": <percentage from 0 to 100>, "explanation": "<Brief explanation of the student's understanding level and what they got right or wrong>"}"""
+
+# System prompt for evaluate_per_question: the same instructions, but several
+# numbered answers to one question are scored in a single request
+PACKED_EVALUATION_SYSTEM_PROMPT = _EVALUATION_INSTRUCTIONS + """You will be given several numbered student answers to the same question. Evaluate each one independently.
+
+REQUIRED FORMAT (one Score/Reason pair per answer, in order):
+Score 1: [percentage from 0% to 100%]
+Reason 1: [Brief explanation of the student's understanding level and what they got right or wrong]
+Score 2: [percentage from 0% to 100%]
+Reason 2: [Brief explanation]
+...and so on for every answer"""
+
+def _utc_timestamp() -> str:
+    """ISO timestamp for evaluation results (called once per returned result)."""
+    return datetime.utcnow().isoformat()
+
 class LLMEvaluator:
     """LLM-based evaluator using Ollama and Llama 7B model."""
     
+    # Length penalty rules: answers shorter than 5% / 15% / 25% of the reference
+    # length are capped at 30% / 50% / 70% of the marks; 25% or more is not penalised
+    _LENGTH_PENALTY_THRESHOLDS = (5, 15, 25)
+    _LENGTH_PENALTY_CAPS = (30, 50, 70, 100)
+    
     def __init__(self, 
                  ollama_url: str = "http://localhost:11434",
                  model_name: str = "llama2:latest",
                  max_retries: int = 3,
                  timeout: int = 60,
-                 sas_threshold: float = 0.15):
+                 sas_threshold: float = 0.15,
+                 cache_db_path: Optional[str] = DEFAULT_CACHE_DB_PATH,
+                 cache_ttl_days: int = 30,
+                 semantic_cache_threshold: Optional[float] = None):
         """
         Initialize the LLM evaluator with SAS quality filter.
         
@@ -42,37 +168,141 @@ class LLMEvaluator:
             max_retries: Maximum number of retries for API calls
             timeout: Timeout for API calls in seconds
             sas_threshold: SAS similarity threshold for quality filtering
+            cache_db_path: SQLite file for the persistent LLM response cache (None disables it)
+            cache_ttl_days: Days after which persisted LLM responses expire
+            semantic_cache_threshold: Reuse the LLM response of a previous answer at least this
+                similar (cosine similarity of the embeddings). Off by default (None): a similar
+                answer is not necessarily an equally correct one, e.g. a negated sentence
         """
         self.ollama_url = ollama_url
         self.model_name = model_name
         self.max_retries = max_retries
         self.timeout = timeout
+        self.connect_timeout = 10  # Fail fast when Ollama is down instead of waiting the full timeout
         self.filter_threshold = 0.3  # Balanced threshold for filtering
+        # Optional gates for junk answers, off by default: short answers such as "O(n)",
+        # "TCP" or "42" can be fully correct, so only raise these for question sets where
+        # a short answer can never be
+        self.min_answer_length = 0  # Answers shorter than this (in characters) are not evaluated
+        self.min_answer_ratio = 0.0  # ...or shorter than this fraction of the reference answer
+        self.min_answer_letters = 0  # ...or with fewer letters than this
+        self.keep_alive = "30m"  # Keep the model (and cached system prompt) loaded between calls
+        self.cache_size = 4096  # Maximum number of cached evaluations
+        self.semantic_cache_threshold = semantic_cache_threshold
+        self.ready_timeout = 10  # Seconds to wait for the background connection check
+        self.max_concurrency = 5  # Concurrent Ollama requests in batch evaluation (match OLLAMA_NUM_PARALLEL)
+        self.packed_max_chars = 4000  # Limit on answer text packed into one prompt (keeps within num_ctx)
+        
+        # The connection check runs in a background thread; is_available waits for it
+        self._ready = threading.Event()
         self.is_available = False
         
+        # Per-answer part of the prompt; the static instructions go in the system prompt.
+        # The reference answer comes first so all answers to the same question share
+        # a longer prompt prefix that Ollama can reuse from its KV cache.
+        self._prompt_tpl = string.Template(
+            "Reference Answer: $reference_answer\nStudent Answer: $student_answer\n\nNow evaluate:"
+        )
+        
+        # LRU cache of evaluations keyed on (model, max marks, reference, student answer)
+        self._exact_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Semantic cache for near-identical answers: per (model, max marks, reference)
+        # key, unit-length float16 answer embeddings (one row per answer) and the raw
+        # LLM response and filter score of each
+        self._semantic_cache: Dict[str, Tuple[np.ndarray, List[Tuple[str, float]]]] = {}
+        
+        # Persistent cache of LLM responses keyed by prompt hash (survives restarts);
+        # opened on first use so nothing is opened before a server forks its workers
+        self.cache_ttl_days = cache_ttl_days
+        self.cache_db_path = os.path.expanduser(cache_db_path) if cache_db_path else None
+        self._cache_db: Optional[sqlite3.Connection] = None
+        self._cache_db_lock = threading.Lock()
+        
+        # Ollama requests currently in flight, keyed by prompt hash
+        self._inflight: Dict[bytes, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Pre-encoded static part of the Ollama request body, as (model_name, bytes)
+        self._payload_head: Optional[Tuple[str, bytes]] = None
+        
+        # Pooled HTTP session so connections to Ollama are kept alive between calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': 'gzip, deflate'})
+        
         # Initialize primary filter for quality filtering (if available)
         if PRIMARY_FILTER_AVAILABLE:
             try:
                 self.primary_filter = PrimaryFilter(threshold=0.3)
-                print(f"✅ Primary Filter initialized with threshold: 0.3")
+                logger.info("✅ Primary Filter initialized with threshold: 0.3")
             except Exception as e:
-                print(f"❌ Failed to initialize primary filter: {e}")
-                print("⚠️ Continuing without primary filter - LLM evaluation only")
+                logger.error(f"❌ Failed to initialize primary filter: {e} - continuing with LLM evaluation only")
                 self.primary_filter = None
         else:
-            print("⚠️ Primary Filter not available - LLM evaluation only")
+            logger.warning("⚠️ Primary Filter not available - LLM evaluation only")
+            self.primary_filter = None
+        
+        # Load the embedding model and test the Ollama connection without blocking startup
+        if self.primary_filter is not None:
+            threading.Thread(target=self._load_primary_filter, name='primary-filter-load', daemon=True).start()
+        threading.Thread(target=self._test_connection_bg, name='ollama-warmup', daemon=True).start()
+    
+    @property
+    def is_available(self) -> bool:
+        """Whether Ollama and the model are usable; waits for the startup check to finish."""
+        self._ready.wait(timeout=self.ready_timeout)
+        return self._is_available
+    
+    @is_available.setter
+    def is_available(self, value: bool):
+        self._is_available = value
+    
+    def _load_primary_filter(self):
+        """Load the primary filter's embedding model; without it, evaluate with the LLM only."""
+        try:
+            self.primary_filter.ensure_model_loaded()
+        except Exception as e:
+            logger.error(f"❌ Failed to load primary filter model: {e} - continuing with LLM evaluation only")
             self.primary_filter = None
+    
+    def _test_connection_bg(self):
+        """Run the connection check, then warm up the model and the connection pool."""
+        try:
+            self._test_connection()
+        finally:
+            self._ready.set()
         
-        # Test connection and model availability
-        self._test_connection()
+        if self._is_available:
+            self._warm_up_model()
+    
+    def _warm_up_model(self):
+        """Load the model (and system prompt) with a one-token generation so the first evaluation is fast."""
+        payload = self._static_payload()
+        payload.update({"prompt": "", "stream": False})
+        payload["options"]["num_predict"] = 1
+        
+        try:
+            self.session.post(
+                f"{self.ollama_url}/api/generate",
+                data=_json_dumps(payload),
+                headers=_JSON_HEADERS,
+                timeout=(self.connect_timeout, self.timeout)
+            ).close()
+            logger.info(f"🔥 Model {self.model_name} warmed up")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"⚠️ Model warm-up failed: {str(e)}")
     
     def _test_connection(self):
         """Test connection to Ollama and model availability."""
         try:
             # Test if Ollama is running
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=5)
             if response.status_code == 200:
-                models = response.json().get('models', [])
+                models = _json_loads(response.content).get('models', [])
                 model_names = [model['name'] for model in models]
                 
                 if self.model_name in model_names:
@@ -108,103 +338,308 @@ class LLMEvaluator:
             logger.error("LLM Evaluator is not available")
             return None
         
-        payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.3,  # Lower temperature for more consistent evaluation
-                "top_p": 0.9,
-                "max_tokens": 1000
-            }
-        }
+        persisted_response = self._get_persisted_response(prompt)
+        if persisted_response is not None:
+            return persisted_response
         
+        # Identical prompts already in flight (e.g. two students submitting the
+        # same answer at once) share a single request
+        prompt_hash, inflight, is_owner = self._claim_inflight(prompt)
+        if not is_owner:
+            return inflight.result()
+        
+        llm_response = None
+        try:
+            llm_response = self._post_generate(self._build_payload(prompt))
+            if llm_response is not None:
+                self._persist_response(prompt, llm_response)
+        finally:
+            self._release_inflight(prompt_hash, inflight, llm_response)
+        return llm_response
+    
+    def _post_generate(self, body: bytes, stop_at_reason: bool = True,
+                       stop_pattern: Optional["re.Pattern[str]"] = None) -> Optional[str]:
+        """
+        POST an encoded request body to /api/generate, retrying transient failures.
+        
+        Args:
+            body: JSON-encoded request body
+            stop_at_reason: Stop reading once the first "Reason:" line is complete
+            stop_pattern: Otherwise, stop reading once the response matches this pattern
+            
+        Returns:
+            Response from the model or None if failed
+        """
         for attempt in range(self.max_retries):
             try:
-                response = requests.post(
+                with self.session.post(
                     f"{self.ollama_url}/api/generate",
-                    json=payload,
-                    timeout=self.timeout
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get('response', '').strip()
-                else:
-                    logger.warning(f"Attempt {attempt + 1}: HTTP {response.status_code}")
+                    data=body,
+                    headers=_JSON_HEADERS,
+                    timeout=(self.connect_timeout, self.timeout),
+                    stream=True
+                ) as response:
+                    if response.status_code == 200:
+                        # Leaving the block early closes the connection, which stops generation
+                        chunks = []
+                        for line in response.iter_lines():
+                            if self._append_stream_line(line, chunks, stop_at_reason, stop_pattern):
+                                break
+                        return ''.join(chunks).strip()
+                    elif response.status_code not in _RETRYABLE_STATUS and response.status_code < 500:
+                        # Client errors (bad request, unknown model, ...) will not succeed on retry
+                        logger.error(f"Ollama rejected the request: HTTP {response.status_code}")
+                        return None
+                    else:
+                        logger.warning(f"Attempt {attempt + 1}: HTTP {response.status_code}")
                     
             except requests.exceptions.RequestException as e:
                 logger.warning(f"Attempt {attempt + 1}: {str(e)}")
+            except ValueError as e:
+                logger.error(f"Malformed response from Ollama: {str(e)}")
+                return None
                 
             if attempt < self.max_retries - 1:
-                import time
-                time.sleep(2 ** attempt)  # Exponential backoff
+                time.sleep(self._retry_delay(attempt))
         
         logger.error("Failed to get response from Ollama after all retries")
         return None
     
-    def _create_evaluation_prompt(self, 
-                                 question: str, 
-                                 reference_answer: str, 
-                                 student_answer: str,
-                                 max_marks: int,
-                                 similarity_score: float = 0.0) -> str:
+    async def _acall_ollama(self, client: Optional["httpx.AsyncClient"], prompt: str) -> Optional[str]:
         """
-        Create a comprehensive educational evaluation prompt for the LLM.
+        Async variant of _call_ollama.
+        
+        Args:
+            client: Shared httpx.AsyncClient, or None to run _call_ollama on a worker thread
+            prompt: The prompt to send to the model
+            
+        Returns:
+            Response from the model or None if failed
+        """
+        if client is None:
+            return await asyncio.to_thread(self._call_ollama, prompt)
+        
+        if not self.is_available:
+            logger.error("LLM Evaluator is not available")
+            return None
+        
+        persisted_response = self._get_persisted_response(prompt)
+        if persisted_response is not None:
+            return persisted_response
+        
+        prompt_hash, inflight, is_owner = self._claim_inflight(prompt)
+        if not is_owner:
+            return await asyncio.wrap_future(inflight)
+        
+        llm_response = None
+        try:
+            llm_response = await self._apost_generate(client, self._build_payload(prompt))
+            if llm_response is not None:
+                self._persist_response(prompt, llm_response)
+        finally:
+            self._release_inflight(prompt_hash, inflight, llm_response)
+        return llm_response
+    
+    async def _apost_generate(self, client: "httpx.AsyncClient", body: bytes) -> Optional[str]:
+        """Async variant of _post_generate."""
+        for attempt in range(self.max_retries):
+            try:
+                async with client.stream(
+                    'POST', f"{self.ollama_url}/api/generate", content=body, headers=_JSON_HEADERS
+                ) as response:
+                    if response.status_code == 200:
+                        chunks = []
+                        async for line in response.aiter_lines():
+                            if self._append_stream_line(line, chunks):
+                                break
+                        return ''.join(chunks).strip()
+                    elif response.status_code not in _RETRYABLE_STATUS and response.status_code < 500:
+                        logger.error(f"Ollama rejected the request: HTTP {response.status_code}")
+                        return None
+                    else:
+                        logger.warning(f"Attempt {attempt + 1}: HTTP {response.status_code}")
+                    
+            except httpx.HTTPError as e:
+                logger.warning(f"Attempt {attempt + 1}: {str(e)}")
+            except ValueError as e:
+                logger.error(f"Malformed response from Ollama: {str(e)}")
+                return None
+                
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(self._retry_delay(attempt))
+        
+        logger.error("Failed to get response from Ollama after all retries")
+        return None
+    
+    def _claim_inflight(self, prompt: str) -> Tuple[bytes, Future, bool]:
+        """
+        Register a request for prompt, or join one that is already in flight.
+        
+        Returns:
+            Tuple of (prompt hash, future for the response, whether the caller
+            owns the request and must release it with _release_inflight)
+        """
+        prompt_hash = self._prompt_hash(prompt)
+        with self._inflight_lock:
+            inflight = self._inflight.get(prompt_hash)
+            if inflight is not None:
+                return prompt_hash, inflight, False
+            inflight = self._inflight[prompt_hash] = Future()
+            return prompt_hash, inflight, True
+    
+    def _release_inflight(self, prompt_hash: bytes, inflight: Future, llm_response: Optional[str]):
+        """Hand the response to any callers waiting on the same prompt."""
+        with self._inflight_lock:
+            self._inflight.pop(prompt_hash, None)
+        inflight.set_result(llm_response)
+    
+    @staticmethod
+    def _retry_delay(attempt: int) -> float:
+        """Exponential backoff with jitter, so concurrent retries don't hit Ollama in lockstep."""
+        return random.uniform(0.5, 1.5) * (2 ** attempt)
+    
+    def _get_cache_db(self) -> Optional[sqlite3.Connection]:
+        """Open (and create if needed) the persistent LLM response cache; None if it is disabled."""
+        if self._cache_db is None and self.cache_db_path:
+            try:
+                os.makedirs(os.path.dirname(self.cache_db_path) or '.', exist_ok=True)
+                connection = sqlite3.connect(self.cache_db_path, isolation_level=None, check_same_thread=False)
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS llm_responses '
+                    '(prompt_hash BLOB PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)'
+                )
+                # Evict expired entries
+                connection.execute(
+                    'DELETE FROM llm_responses WHERE created_at < ?',
+                    (time.time() - self.cache_ttl_days * 86400,)
+                )
+                self._cache_db = connection
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Persistent LLM cache disabled, could not open {self.cache_db_path}: {str(e)}")
+                self.cache_db_path = None
+        return self._cache_db
+    
+    def _prompt_hash(self, prompt: str) -> bytes:
+        """Hash identifying an LLM request (model, system prompt and prompt)."""
+        return hashlib.blake2b(
+            f"{self.model_name}|{EVALUATION_SYSTEM_PROMPT}|{prompt}".encode('utf-8'), digest_size=16
+        ).digest()
+    
+    def _get_persisted_response(self, prompt: str) -> Optional[str]:
+        """Look up a previous LLM response for this prompt in the persistent cache."""
+        if not self.cache_db_path:
+            return None
+        
+        try:
+            with self._cache_db_lock:
+                cache_db = self._get_cache_db()
+                if cache_db is None:
+                    return None
+                row = cache_db.execute(
+                    'SELECT response FROM llm_responses WHERE prompt_hash = ? AND created_at >= ?',
+                    (self._prompt_hash(prompt), time.time() - self.cache_ttl_days * 86400)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent LLM cache lookup failed: {str(e)}")
+            return None
+    
+    def _persist_response(self, prompt: str, response: str):
+        """Store an LLM response in the persistent cache (responses without a parseable score are not kept)."""
+        if not self.cache_db_path or not response or try_parse_llm_response(response, 100) is None:
+            return
+        
+        try:
+            with self._cache_db_lock:
+                cache_db = self._get_cache_db()
+                if cache_db is None:
+                    return
+                cache_db.execute(
+                    'INSERT OR REPLACE INTO llm_responses (prompt_hash, response, created_at) VALUES (?, ?, ?)',
+                    (self._prompt_hash(prompt), response, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Persistent LLM cache write failed: {str(e)}")
+    
+    def _append_stream_line(self, line, chunks: List[str], stop_at_reason: bool = True,
+                            stop_pattern: Optional["re.Pattern[str]"] = None) -> bool:
+        """
+        Add one line of a streamed (NDJSON) Ollama response to chunks.
+        
+        Returns:
+            True once the response is complete - either Ollama is done or, with
+            stop_at_reason, the JSON object (or, for models that ignore JSON mode,
+            the "Reason:" line) has been generated, or stop_pattern matches
+            (nothing after that is used)
+        """
+        if not line:
+            return False
+        
+        chunk = _json_loads(line)
+        text = chunk.get('response', '')
+        chunks.append(text)
+        
+        if chunk.get('done'):
+            return True
+        if not stop_at_reason:
+            return stop_pattern is not None and '\n' in text and stop_pattern.search(''.join(chunks)) is not None
+        
+        if '}' in text:
+            try:
+                _json_loads(''.join(chunks))
+                return True
+            except ValueError:
+                pass
+        return '\n' in text and _RE_REASON_LINE.search(''.join(chunks)) is not None
+    
+    def _build_payload(self, prompt: str) -> bytes:
+        """
+        Build the JSON-encoded /api/generate request body for a prompt.
+        
+        Everything except the prompt is encoded once (per model) and reused.
+        """
+        if self._payload_head is None or self._payload_head[0] != self.model_name:
+            # Drop the closing brace so the prompt can be appended
+            self._payload_head = (self.model_name, _json_dumps(self._static_payload())[:-1])
+        
+        return self._payload_head[1] + b', "prompt": ' + _json_dumps(prompt) + b'}'
+    
+    def _static_payload(self) -> Dict[str, Any]:
+        """The parts of the /api/generate request that are the same for every prompt."""
+        return {
+            "model": self.model_name,
+            "system": EVALUATION_SYSTEM_PROMPT,
+            "stream": True,  # Lets us stop reading as soon as the Reason line is complete
+            "keep_alive": self.keep_alive,
+            "format": "json",  # Ollama constrains the output to valid JSON
+            "options": {
+                "temperature": 0.3,  # Lower temperature for more consistent evaluation
+                "top_p": 0.9,
+                "seed": 42,  # Fixed seed: the same prompt gets the same evaluation, cached or not
+                "num_predict": 256,  # Score + brief explanation; caps generation server-side
+                "num_ctx": 2048  # Fixed context size; changing it between requests forces a model reload
+            }
+        }
+    
+    def _create_evaluation_prompt(self, reference_answer: str, student_answer: str) -> str:
+        """
+        Create the per-answer evaluation prompt for the LLM.
+        
+        The question and max marks are deliberately left out: the LLM gives a percentage
+        that is rescaled afterwards, so the prompt depends only on the two answers.
         
         Args:
-            question: The exam question
             reference_answer: The reference/expected answer
             student_answer: The student's answer
-            max_marks: Maximum marks for this question
-            similarity_score: Similarity score from primary filter (0.0-1.0)
             
         Returns:
             Formatted prompt for the LLM
         """
-        prompt = f"""You are an expert educational evaluator. Evaluate the student's answer based on conceptual understanding and provide a percentage score.
-
-CRITICAL: If the student's answer is completely unrelated to the question topic or shows no understanding, give 0% immediately.
-
-Student Answer: {student_answer}
-Reference Answer: {reference_answer}
-
-EVALUATION CRITERIA:
-1. Conceptual Accuracy (40%): Core concepts correctly identified and explained
-2. Completeness (30%): Addresses key points from reference answer
-3. Depth & Coverage (15%): Sufficient detail and comprehensive coverage
-4. Clarity & Communication (15%): Clear, well-organized explanation
-
-SCORING GUIDELINES:
-- 90-100%: Excellent understanding, comprehensive coverage
-- 80-89%: Strong understanding, addresses most key points
-- 70-79%: Good understanding, covers main concepts
-- 60-69%: Adequate understanding, partial coverage
-- 50-59%: Basic understanding, significant gaps
-- 40-49%: Limited understanding, major gaps
-- 30-39%: Poor understanding, minimal knowledge
-- 20-29%: Very poor understanding, mostly incorrect
-- 10-19%: Minimal understanding, mostly wrong
-- 0-9%: No understanding, completely incorrect or unrelated
-
-EVALUATION RULES:
-- Focus on CONCEPTUAL UNDERSTANDING, not exact wording
-- Accept equivalent concepts expressed differently
-- Reward comprehensive coverage even if details differ
-- Give 0% for answers showing no understanding of the topic
-- Give 0% for completely unrelated or nonsensical answers
-- Give 0% for answers that are clearly wrong or demonstrate no knowledge
-- Be fair but strict - partial credit only for actual understanding
-- Ignore the similarity score - evaluate independently
-- If answer is unrelated to the question topic, give 0% immediately
-
-REQUIRED FORMAT:
-Score: [percentage from 0% to 100%]
-Reason: [Brief explanation of the student's understanding level and what they got right or wrong]
-
-Now evaluate:"""
-
-        return prompt
+        return self._prompt_tpl.substitute(
+            student_answer=student_answer,
+            reference_answer=reference_answer
+        )
     
     def evaluate(self, 
                  student_answer: str, 
@@ -223,6 +658,422 @@ Now evaluate:"""
         Returns:
             Dictionary containing evaluation results
         """
+        precheck_result = self._precheck_answer(student_answer, reference_answer)
+        if precheck_result is not None:
+            return precheck_result
+        
+        cache_key = self._cache_key(student_answer, reference_answer, max_marks)
+        cached_result = self._get_cached_result(cache_key)
+        if cached_result is not None:
+            return cached_result
+        
+        semantic_hits, embeddings = self._lookup_semantic_cache(
+            [(cache_key, student_answer, reference_answer, max_marks)]
+        )
+        if cache_key in semantic_hits:
+            return semantic_hits[cache_key]
+        
+        try:
+            # Step 1: Primary Quality Filter - Check if answer is relevant enough for LLM evaluation
+            # (reusing the embedding computed for the semantic cache lookup, if any)
+            embedding = embeddings.get(cache_key)
+            filter_result = None if embedding is None else self._batch_primary_filter(
+                [{'student_answer': student_answer, 'reference_answer': reference_answer}], [embedding]
+            )[0]
+            filtered_result, filter_score, filter_passed = self._apply_primary_filter(
+                student_answer, reference_answer, filter_result
+            )
+            if filtered_result is not None:
+                return filtered_result
+            
+            # Step 2: LLM Evaluation (only if primary filter passes)
+            prompt = self._create_evaluation_prompt(reference_answer, student_answer)
+            
+            # Get LLM response
+            llm_response = self._call_ollama(prompt)
+            
+            result = self._build_evaluation_result(
+                llm_response, student_answer, reference_answer, max_marks, filter_score, filter_passed
+            )
+            self._store_cached_result(cache_key, result)
+            self._store_semantic_result(reference_answer, max_marks, embeddings.get(cache_key), result)
+            return result
+            
+        except Exception as e:
+            return self._evaluation_error_result(e)
+    
+    async def aevaluate_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Evaluate several answers concurrently.
+        
+        The Ollama requests are issued together so the server can work on them in
+        parallel (set OLLAMA_NUM_PARALLEL on the Ollama server to allow this).
+        
+        Args:
+            items: Dicts with 'student_answer', 'reference_answer' and optionally
+                   'question' and 'max_marks' keys (same meaning as in evaluate)
+            
+        Returns:
+            List of evaluation results in the same order as items
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        
+        # Answers that pass the pre-checks and are not cached still need evaluating.
+        # Identical answers to the same question are only evaluated once.
+        pending: Dict[str, Tuple[Dict[str, Any], List[int]]] = {}
+        for index, item in enumerate(items):
+            student_answer = item['student_answer']
+            reference_answer = item['reference_answer']
+            
+            precheck_result = self._precheck_answer(student_answer, reference_answer)
+            if precheck_result is not None:
+                results[index] = precheck_result
+                continue
+            
+            cache_key = self._cache_key(student_answer, reference_answer, item.get('max_marks', 10))
+            if cache_key in pending:
+                pending[cache_key][1].append(index)
+                continue
+            
+            cached_result = self._get_cached_result(cache_key)
+            if cached_result is not None:
+                results[index] = cached_result
+                continue
+            
+            pending[cache_key] = (item, [index])
+        
+        # Near-identical answers to an already evaluated one reuse its evaluation
+        semantic_hits, embeddings = self._lookup_semantic_cache([
+            (cache_key, item['student_answer'], item['reference_answer'], item.get('max_marks', 10))
+            for cache_key, (item, _) in pending.items()
+        ])
+        pending_entries = []
+        for cache_key, (item, indices) in pending.items():
+            if cache_key in semantic_hits:
+                for index in indices:
+                    results[index] = copy.deepcopy(semantic_hits[cache_key])
+            else:
+                pending_entries.append((cache_key, (item, indices)))
+        
+        # Score all pending answers with the primary filter in a single encoder pass
+        filter_results = self._batch_primary_filter(
+            [item for _, (item, _) in pending_entries],
+            [embeddings.get(cache_key) for cache_key, _ in pending_entries]
+        )
+        
+        # Bound the number of requests in flight so Ollama isn't flooded with queued work
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def evaluate_item(client, item, cache_key, filter_result):
+            student_answer = item['student_answer']
+            reference_answer = item['reference_answer']
+            max_marks = item.get('max_marks', 10)
+            
+            try:
+                filtered_result, filter_score, filter_passed = self._apply_primary_filter(
+                    student_answer, reference_answer, filter_result
+                )
+                if filtered_result is not None:
+                    return filtered_result
+                
+                prompt = self._create_evaluation_prompt(reference_answer, student_answer)
+                async with semaphore:
+                    llm_response = await self._acall_ollama(client, prompt)
+                
+                result = self._build_evaluation_result(
+                    llm_response, student_answer, reference_answer, max_marks, filter_score, filter_passed
+                )
+                self._store_cached_result(cache_key, result)
+                self._store_semantic_result(reference_answer, max_marks, embeddings.get(cache_key), result)
+                return result
+                
+            except Exception as e:
+                return self._evaluation_error_result(e)
+        
+        if HTTPX_AVAILABLE:
+            limits = httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0)
+            timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout)
+            # HTTP/2 multiplexing only applies to https (e.g. Ollama behind a TLS proxy)
+            async with httpx.AsyncClient(timeout=timeout, limits=limits, http2=H2_AVAILABLE) as client:
+                evaluated = await asyncio.gather(*(
+                    evaluate_item(client, item, cache_key, filter_result)
+                    for (cache_key, (item, _)), filter_result in zip(pending_entries, filter_results)
+                ))
+        else:
+            # Without httpx, run the blocking calls on worker threads
+            evaluated = await asyncio.gather(*(
+                evaluate_item(None, item, cache_key, filter_result)
+                for (cache_key, (item, _)), filter_result in zip(pending_entries, filter_results)
+            ))
+        
+        # Fan results out to every position that shared the same answer
+        for (_, (_, indices)), result in zip(pending_entries, evaluated):
+            results[indices[0]] = result
+            for index in indices[1:]:
+                results[index] = copy.deepcopy(result)
+        
+        return results
+    
+    def evaluate_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Evaluate several answers concurrently (blocking wrapper around aevaluate_batch).
+        
+        Must not be called from a running event loop; use aevaluate_batch there.
+        """
+        return asyncio.run(self.aevaluate_batch(items))
+    
+    def evaluate_per_question(self,
+                              question: str,
+                              reference_answer: str,
+                              student_answers: List[str],
+                              max_marks: int = 10,
+                              k: int = 4) -> List[Dict[str, Any]]:
+        """
+        Evaluate many students' answers to one question, packing up to k answers
+        into each LLM request so the shared instructions and reference answer are
+        only processed once per group.
+        
+        Args:
+            question: The exam question
+            reference_answer: The reference answer
+            student_answers: The students' answers
+            max_marks: Maximum marks for this question
+            k: Maximum number of answers per LLM request
+            
+        Returns:
+            List of evaluation results in the same order as student_answers
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(student_answers)
+        
+        # Pre-checks, cache and in-batch dedup, as in aevaluate_batch
+        pending: Dict[str, Tuple[str, List[int]]] = {}
+        for index, student_answer in enumerate(student_answers):
+            precheck_result = self._precheck_answer(student_answer, reference_answer)
+            if precheck_result is not None:
+                results[index] = precheck_result
+                continue
+            
+            cache_key = self._cache_key(student_answer, reference_answer, max_marks)
+            if cache_key in pending:
+                pending[cache_key][1].append(index)
+                continue
+            
+            cached_result = self._get_cached_result(cache_key)
+            if cached_result is not None:
+                results[index] = cached_result
+                continue
+            
+            pending[cache_key] = (student_answer, [index])
+        
+        semantic_hits, embeddings = self._lookup_semantic_cache([
+            (cache_key, student_answer, reference_answer, max_marks)
+            for cache_key, (student_answer, _) in pending.items()
+        ])
+        pending_entries = []
+        for cache_key, (student_answer, indices) in pending.items():
+            if cache_key in semantic_hits:
+                for index in indices:
+                    results[index] = copy.deepcopy(semantic_hits[cache_key])
+            else:
+                pending_entries.append((cache_key, (student_answer, indices)))
+        filter_results = self._batch_primary_filter([
+            {'student_answer': student_answer, 'reference_answer': reference_answer}
+            for _, (student_answer, _) in pending_entries
+        ], [embeddings.get(cache_key) for cache_key, _ in pending_entries])
+        
+        # Answers that pass the primary filter go to the LLM: (cache_key, answer, filter_score, indices)
+        to_evaluate: List[Tuple[str, str, float, List[int]]] = []
+        for (cache_key, (student_answer, indices)), filter_result in zip(pending_entries, filter_results):
+            try:
+                filtered_result, filter_score, _ = self._apply_primary_filter(
+                    student_answer, reference_answer, filter_result
+                )
+            except Exception as e:
+                filtered_result = self._evaluation_error_result(e)
+            
+            if filtered_result is not None:
+                for index in indices:
+                    results[index] = copy.deepcopy(filtered_result)
+            else:
+                to_evaluate.append((cache_key, student_answer, filter_score, indices))
+        
+        for group in self._pack_answers(to_evaluate, k):
+            llm_responses = self._call_ollama_packed(reference_answer, [entry[1] for entry in group])
+            
+            for (cache_key, student_answer, filter_score, indices), llm_response in zip(group, llm_responses):
+                try:
+                    result = self._build_evaluation_result(
+                        llm_response, student_answer, reference_answer, max_marks, filter_score, True
+                    )
+                    self._store_cached_result(cache_key, result)
+                    self._store_semantic_result(reference_answer, max_marks, embeddings.get(cache_key), result)
+                except Exception as e:
+                    result = self._evaluation_error_result(e)
+                
+                results[indices[0]] = result
+                for index in indices[1:]:
+                    results[index] = copy.deepcopy(result)
+        
+        return results
+    
+    def _pack_answers(self, entries: List[Tuple], k: int) -> List[List[Tuple]]:
+        """Split entries (answer text at index 1) into groups of at most k answers and packed_max_chars characters."""
+        groups: List[List[Tuple]] = []
+        group_chars = 0
+        for entry in entries:
+            answer_chars = len(entry[1])
+            if not groups or len(groups[-1]) >= k or group_chars + answer_chars > self.packed_max_chars:
+                groups.append([])
+                group_chars = 0
+            groups[-1].append(entry)
+            group_chars += answer_chars
+        return groups
+    
+    def _call_ollama_packed(self, reference_answer: str, student_answers: List[str]) -> List[Optional[str]]:
+        """
+        Evaluate several answers to the same question with a single Ollama request.
+        
+        Returns:
+            One "Score: ...\nReason: ..." response per answer. Falls back to one
+            request per answer if the packed response can't be split cleanly.
+        """
+        if len(student_answers) == 1:
+            return [self._call_ollama(self._create_evaluation_prompt(reference_answer, student_answers[0]))]
+        
+        prompt = f"Reference Answer: {reference_answer}\n" + "".join(
+            f"Student Answer {number}: {student_answer}\n"
+            for number, student_answer in enumerate(student_answers, start=1)
+        ) + "\nNow evaluate each answer:"
+        
+        payload = self._static_payload()
+        payload["system"] = PACKED_EVALUATION_SYSTEM_PROMPT
+        del payload["format"]  # Packed responses use numbered "Score i:" / "Reason i:" lines
+        payload["prompt"] = prompt
+        payload["options"]["num_predict"] *= len(student_answers)
+        
+        # Stop reading once the last answer's Reason line is complete
+        last_reason = re.compile(rf'Reason\s*{len(student_answers)}\s*:[^\n]*\S[^\n]*\n')
+        llm_response = self._post_generate(_json_dumps(payload), stop_at_reason=False, stop_pattern=last_reason)
+        responses = split_packed_llm_response(llm_response or '', len(student_answers))
+        if responses:
+            return responses
+        
+        logger.warning(f"Could not split packed response for {len(student_answers)} answers, evaluating individually")
+        return [
+            self._call_ollama(self._create_evaluation_prompt(reference_answer, student_answer))
+            for student_answer in student_answers
+        ]
+    
+    def _cache_key(self, student_answer: str, reference_answer: str, max_marks: int) -> str:
+        """Key for the evaluation cache."""
+        return hashlib.sha1(
+            f"{self.model_name}|{max_marks}|{reference_answer}|{student_answer}".encode('utf-8')
+        ).hexdigest()
+    
+    def _get_cached_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached evaluation result, or None on a cache miss."""
+        with self._cache_lock:
+            cached_result = self._exact_cache.get(cache_key)
+            if cached_result is None:
+                return None
+            self._exact_cache.move_to_end(cache_key)
+        
+        result = copy.deepcopy(cached_result)
+        result['details']['cache'] = 'exact_hit'
+        return result
+    
+    def _store_cached_result(self, cache_key: str, result: Dict[str, Any]):
+        """Cache a successful LLM evaluation (errors are never cached)."""
+        if result['details'].get('status') != 'evaluated':
+            return
+        
+        with self._cache_lock:
+            self._exact_cache[cache_key] = copy.deepcopy(result)
+            self._exact_cache.move_to_end(cache_key)
+            while len(self._exact_cache) > self.cache_size:
+                self._exact_cache.popitem(last=False)
+    
+    def _lookup_semantic_cache(self,
+                               entries: List[Tuple[str, str, str, int]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, np.ndarray]]:
+        """
+        Find evaluations of near-identical answers to the same question.
+        
+        Only the other answer's raw LLM response is reused; the length penalty and
+        score scaling are applied to the answer being evaluated.
+        
+        Args:
+            entries: (cache_key, student_answer, reference_answer, max_marks) tuples
+            
+        Returns:
+            Tuple of (results built from the matching responses by cache key, answer
+            embeddings by cache key for storing the new evaluations later)
+        """
+        if not self.primary_filter or not entries or self.semantic_cache_threshold is None:
+            return {}, {}
+        
+        try:
+            embeddings = self.primary_filter.embed([entry[1] for entry in entries])
+        except Exception as e:
+            logger.warning(f"⚠️ Could not embed answers for the semantic cache: {e}")
+            return {}, {}
+        
+        matches: Dict[str, Tuple[str, float]] = {}
+        with self._cache_lock:
+            for (cache_key, _, reference_answer, max_marks), embedding in zip(entries, embeddings):
+                cached = self._semantic_cache.get(self._semantic_key(reference_answer, max_marks))
+                if cached is None:
+                    continue
+                similarities = cached[0].astype(np.float32) @ embedding.astype(np.float32, copy=False)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.semantic_cache_threshold:
+                    matches[cache_key] = cached[1][best]
+        
+        semantic_hits = {}
+        for cache_key, student_answer, reference_answer, max_marks in entries:
+            if cache_key not in matches:
+                continue
+            llm_response, filter_score = matches[cache_key]
+            result = self._build_evaluation_result(
+                llm_response, student_answer, reference_answer, max_marks, filter_score, True
+            )
+            result['details']['cache'] = 'semantic_hit'
+            semantic_hits[cache_key] = result
+        
+        return semantic_hits, {entry[0]: embedding for entry, embedding in zip(entries, embeddings)}
+    
+    def _store_semantic_result(self,
+                               reference_answer: str,
+                               max_marks: int,
+                               embedding: Optional[np.ndarray],
+                               result: Dict[str, Any]):
+        """Add the raw response of a successful LLM evaluation to the semantic cache."""
+        if embedding is None or result['details'].get('status') != 'evaluated':
+            return
+        
+        semantic_key = self._semantic_key(reference_answer, max_marks)
+        with self._cache_lock:
+            cached = self._semantic_cache.get(semantic_key)
+            embedding = embedding.astype(np.float16)
+            if cached is None:
+                matrix, cached_responses = embedding[np.newaxis, :], []
+            else:
+                matrix, cached_responses = np.vstack((cached[0], embedding)), cached[1]
+            cached_responses.append((result['details']['raw_response'], result['details']['filter_score']))
+            
+            # Drop the oldest answers once a question has more than cache_size of them
+            if len(cached_responses) > self.cache_size:
+                matrix, cached_responses = matrix[1:], cached_responses[1:]
+            self._semantic_cache[semantic_key] = (matrix, cached_responses)
+    
+    def _semantic_key(self, reference_answer: str, max_marks: int) -> str:
+        """Key grouping semantic cache entries that answer the same question."""
+        return hashlib.sha1(f"{self.model_name}|{max_marks}|{reference_answer}".encode('utf-8')).hexdigest()
+    
+    def _precheck_answer(self, student_answer: str, reference_answer: str) -> Optional[Dict[str, Any]]:
+        """
+        Return an early result if the evaluator is unavailable or the answer is
+        empty or too trivial to be worth the primary filter and LLM.
+        """
         if not self.is_available:
             return {
                 'score': 0.0,
@@ -232,11 +1083,12 @@ Now evaluate:"""
                     'llm_score': 0.0,
                     'status': 'error',
                     'model_name': self.model_name,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _utc_timestamp()
                 }
             }
         
-        if not student_answer or not student_answer.strip():
+        stripped = student_answer.strip() if student_answer else ''
+        if not stripped:
             return {
                 'score': 0.0,
                 'explanation': 'No answer provided',
@@ -244,243 +1096,227 @@ Now evaluate:"""
                     'llm_score': 0.0,
                     'status': 'empty_answer',
                     'model_name': self.model_name,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _utc_timestamp()
+                }
+            }
+        
+        # Cheap checks for junk answers, if configured (see min_answer_length)
+        length_ratio = len(stripped) / max(1, len(reference_answer))
+        if (len(stripped) < self.min_answer_length
+                or length_ratio < self.min_answer_ratio
+                or (self.min_answer_letters and sum(c.isalpha() for c in stripped) < self.min_answer_letters)):
+            return {
+                'final_score': 0.0,
+                'explanation': 'Answer too short to evaluate',
+                'details': {
+                    'llm_score': 0.0,
+                    'status': 'trivial_answer',
+                    'model_name': self.model_name,
+                    'filter_score': 0.0,
+                    'filter_threshold': self.filter_threshold,
+                    'filter_passed': False,
+                    'timestamp': _utc_timestamp()
                 }
             }
         
+        return None
+    
+    def _batch_primary_filter(self,
+                              items: List[Dict[str, Any]],
+                              embeddings: Optional[List[Optional[np.ndarray]]] = None) -> List[Optional[Dict[str, Any]]]:
+        """
+        Run the primary filter over many answers at once.
+        
+        Args:
+            items: Dicts with 'student_answer' and 'reference_answer' keys
+            embeddings: Student answer embeddings from the semantic cache lookup, in item
+                        order, so the answers are not encoded a second time
+        
+        Returns:
+            Filter results in item order (None entries are filtered individually later)
+        """
+        if not self.primary_filter or not items:
+            return [None] * len(items)
+        
+        student_embeddings = None
+        if embeddings and all(embedding is not None for embedding in embeddings):
+            student_embeddings = np.stack(embeddings)
+        
         try:
-            # Step 1: Primary Quality Filter - Check if answer is relevant enough for LLM evaluation
-            filter_passed = True
-            filter_score = 0.0
-            filter_reason = ""
+            return self.primary_filter.evaluate_batch(
+                [item['student_answer'] for item in items],
+                [item['reference_answer'] for item in items],
+                student_embeddings
+            )['results']
+        except Exception as e:
+            logger.warning(f"⚠️ Primary filter batch evaluation failed: {e}, filtering answers individually")
+            return [None] * len(items)
+    
+    def _apply_primary_filter(self,
+                              student_answer: str,
+                              reference_answer: str,
+                              filter_result: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], float, bool]:
+        """
+        Run the primary quality filter.
+        
+        Args:
+            student_answer: The student's answer
+            reference_answer: The reference answer
+            filter_result: Precomputed PrimaryFilter result (from a batch), if any
             
-            if self.primary_filter:
-                try:
+        Returns:
+            Tuple of (filtered result or None if the answer should go to the LLM,
+            filter score, filter passed)
+        """
+        filter_passed = True
+        filter_score = 0.0
+        filter_reason = ""
+        
+        if self.primary_filter:
+            try:
+                if filter_result is None:
                     filter_result = self.primary_filter.evaluate(student_answer, reference_answer)
-                    filter_score = filter_result['details']['raw_score']
-                    filter_passed = not filter_result['details']['filtered']
-                    filter_reason = filter_result['details']['reason']
-                    
-                    print(f"🔍 Primary Filter: Score={filter_score:.3f}, Passed={filter_passed}, Reason={filter_reason}")
-                    
-                    # If filter score is too low, skip LLM evaluation
-                    if not filter_passed or filter_score < self.filter_threshold:
-                        return {
-                            'final_score': 0.0,
-                            'explanation': 'Irrelevant answer',
-                            'details': {
-                                'llm_score': 0.0,
-                                'status': 'filtered',
-                                'model_name': self.model_name,
-                                'filter_score': filter_score,
-                                'filter_threshold': self.filter_threshold,
-                                'filter_passed': False,
-                                'timestamp': datetime.utcnow().isoformat()
-                            }
+                filter_score = filter_result['details']['raw_score']
+                filter_passed = not filter_result['details']['filtered']
+                filter_reason = filter_result['details']['reason']
+                
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"🔍 Primary Filter: Score={filter_score:.3f}, Passed={filter_passed}, Reason={filter_reason}")
+                
+                # If filter score is too low, skip LLM evaluation
+                if not filter_passed or filter_score < self.filter_threshold:
+                    return {
+                        'final_score': 0.0,
+                        'explanation': 'Irrelevant answer',
+                        'details': {
+                            'llm_score': 0.0,
+                            'status': 'filtered',
+                            'model_name': self.model_name,
+                            'filter_score': filter_score,
+                            'filter_threshold': self.filter_threshold,
+                            'filter_passed': False,
+                            'timestamp': _utc_timestamp()
                         }
-                except Exception as e:
-                    print(f"⚠️ Primary filter evaluation failed: {e}, proceeding with LLM evaluation")
-            
-            # Step 2: LLM Evaluation (only if primary filter passes)
-            prompt = self._create_evaluation_prompt(
-                question=question,
-                reference_answer=reference_answer,
-                student_answer=student_answer,
-                max_marks=max_marks,
-                similarity_score=filter_score
-            )
-            
-            # Get LLM response
-            llm_response = self._call_ollama(prompt)
-            
-            if not llm_response:
-                return {
-                    'final_score': 0.0,
-                    'explanation': 'System error: Could not evaluate answer',
-                    'details': {
-                        'error': 'Failed to get LLM response',
-                        'llm_score': 0.0,
-                        'status': 'error',
-                        'model_name': self.model_name,
-                        'filter_score': filter_score,
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-                }
-            
-            # Parse LLM response
-            llm_score, llm_explanation = self._parse_llm_response(llm_response, max_marks)
-            
-            # Step 3: Apply External Length Penalty
-            length_ratio = (len(student_answer) / len(reference_answer)) * 100
-            score = self._apply_length_penalty(llm_score, length_ratio, max_marks)
-            
-            # Update explanation if length penalty was applied
-            if score < llm_score:
-                explanation = f"{llm_explanation} (Length penalty applied: {length_ratio:.1f}% of reference length)"
-            else:
-                explanation = llm_explanation
-            
-            # Step 4: Validate score range
-            if score < 0 or score > max_marks:
-                print(f"⚠️ Final score out of range: {score}, clamping to valid range")
-                score = max(0, min(score, max_marks))
-                explanation = f"Score adjusted to valid range. {explanation}"
-            
-            # Step 4: Score validation (no consistency check)
-            
+                    }, filter_score, False
+            except Exception as e:
+                logger.warning(f"⚠️ Primary filter evaluation failed: {e}, proceeding with LLM evaluation")
+        
+        return None, filter_score, filter_passed
+    
+    def _build_evaluation_result(self,
+                                 llm_response: Optional[str],
+                                 student_answer: str,
+                                 reference_answer: str,
+                                 max_marks: int,
+                                 filter_score: float,
+                                 filter_passed: bool) -> Dict[str, Any]:
+        """Turn a raw LLM response into the final evaluation result."""
+        if not llm_response:
             return {
-                'final_score': score,
-                'explanation': explanation,
+                'final_score': 0.0,
+                'explanation': 'System error: Could not evaluate answer',
                 'details': {
-                    'llm_score': score,
-                    'status': 'evaluated',
+                    'error': 'Failed to get LLM response',
+                    'llm_score': 0.0,
+                    'status': 'error',
                     'model_name': self.model_name,
-                    'raw_response': llm_response,
                     'filter_score': filter_score,
-                    'filter_threshold': self.filter_threshold,
-                    'filter_passed': filter_passed,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': _utc_timestamp()
                 }
             }
-            
-        except Exception as e:
-            logger.error(f"Error in LLM evaluation: {str(e)}")
+        
+        # Parse LLM response; a response without a score (e.g. truncated JSON) is an error, not a 0
+        parsed = self._parse_llm_response(llm_response, max_marks)
+        if parsed is None:
             return {
                 'final_score': 0.0,
-                'explanation': 'System error during evaluation',
+                'explanation': 'System error: Could not parse evaluation response',
                 'details': {
-                    'error': str(e),
+                    'error': 'Unparseable LLM response',
                     'llm_score': 0.0,
                     'status': 'error',
                     'model_name': self.model_name,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'raw_response': llm_response,
+                    'filter_score': filter_score,
+                    'timestamp': _utc_timestamp()
                 }
             }
+        llm_score, llm_explanation = parsed
+        
+        # Step 3: Apply External Length Penalty and clamp to the valid range in one step
+        length_ratio = len(student_answer) * 100 / len(reference_answer) if reference_answer else 100.0
+        max_allowed_percentage = self._LENGTH_PENALTY_CAPS[
+            bisect.bisect_right(self._LENGTH_PENALTY_THRESHOLDS, length_ratio)
+        ]
+        score = max(0.0, min(llm_score, max_allowed_percentage * max_marks / 100, float(max_marks)))
+        
+        # Update explanation if length penalty was applied
+        if score < llm_score:
+            explanation = f"{llm_explanation} (Length penalty applied: {length_ratio:.1f}% of reference length)"
+        else:
+            explanation = llm_explanation
+        
+        return {
+            'final_score': score,
+            'explanation': explanation,
+            'details': {
+                'llm_score': score,
+                'status': 'evaluated',
+                'model_name': self.model_name,
+                'raw_response': llm_response,
+                'filter_score': filter_score,
+                'filter_threshold': self.filter_threshold,
+                'filter_passed': filter_passed,
+                'timestamp': _utc_timestamp()
+            }
+        }
     
-    def _parse_llm_response(self, response: str, max_marks: int) -> tuple[float, str]:
+    def _evaluation_error_result(self, error: Exception) -> Dict[str, Any]:
+        """Build the result returned when evaluation raises unexpectedly."""
+        logger.error(f"Error in LLM evaluation: {str(error)}")
+        return {
+            'final_score': 0.0,
+            'explanation': 'System error during evaluation',
+            'details': {
+                'error': str(error),
+                'llm_score': 0.0,
+                'status': 'error',
+                'model_name': self.model_name,
+                'timestamp': _utc_timestamp()
+            }
+        }
+    
+    def _parse_llm_response(self, response: str, max_marks: int) -> Optional[Tuple[float, str]]:
         """
         Parse the LLM response to extract score and explanation.
         
+        The parsing itself lives in llm_response_parser so it can be compiled with mypyc.
+        
         Args:
             response: Raw response from LLM
             max_marks: Maximum possible marks
             
         Returns:
-            Tuple of (score, explanation)
+            Tuple of (score, explanation), or None if no score could be parsed
         """
         try:
-            lines = response.strip().split('\n')
-            score = 0.0
-            explanation = "No explanation provided"
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('Score:'):
-                    # Extract score
-                    score_text = line.replace('Score:', '').strip()
-                    try:
-                        # Handle percentage scores (e.g., "85%", "85")
-                        if '%' in score_text:
-                            score_text = score_text.replace('%', '').strip()
-                            percentage = float(score_text)
-                            # Convert percentage to max_marks scale
-                            score = (percentage / 100.0) * max_marks
-                        else:
-                            # Handle direct scores
-                            score = float(score_text)
-                            # If score is > 100, assume it's a percentage
-                            if score > 100:
-                                score = (score / 100.0) * max_marks
-                        
-                        # Ensure score is within valid range
-                        score = max(0, min(score, max_marks))
-                    except ValueError:
-                        logger.warning(f"Could not parse score: {score_text}")
-                        score = 0.0
-                        
-                elif 'Score:' in line and not line.startswith('Score:'):
-                    # Handle case where Score: appears in the middle of a line
-                    score_text = line.split('Score:')[-1].strip()
-                    try:
-                        # Handle percentage scores (e.g., "85%", "85")
-                        if '%' in score_text:
-                            score_text = score_text.replace('%', '').strip()
-                            percentage = float(score_text)
-                            # Convert percentage to max_marks scale
-                            score = (percentage / 100.0) * max_marks
-                        else:
-                            # Handle direct scores
-                            score = float(score_text)
-                            # If score is > 100, assume it's a percentage
-                            if score > 100:
-                                score = (score / 100.0) * max_marks
-                        
-                        # Ensure score is within valid range
-                        score = max(0, min(score, max_marks))
-                    except ValueError:
-                        logger.warning(f"Could not parse score: {score_text}")
-                        score = 0.0
-                        
-                elif 'percentage score of' in line.lower():
-                    # Handle case where LLM says "I would give a percentage score of X%"
-                    try:
-                        # Extract percentage from line
-                        import re
-                        match = re.search(r'(\d+(?:\.\d+)?)%', line)
-                        if match:
-                            percentage = float(match.group(1))
-                            score = (percentage / 100.0) * max_marks
-                            score = max(0, min(score, max_marks))
-                    except (ValueError, AttributeError):
-                        logger.warning(f"Could not parse percentage from line: {line}")
-                        score = 0.0
-                        
-                elif line.startswith('Reason:'):
-                    # Extract reason - single line explanation
-                    explanation = line.replace('Reason:', '').strip()
-            
-            return score, explanation
-            
+            return try_parse_llm_response(response, max_marks)
         except Exception as e:
             logger.error(f"Error parsing LLM response: {str(e)}")
-            return 0.0, "Error parsing evaluation response"
+            return None
     
-    def _apply_length_penalty(self, llm_score: float, length_ratio: float, max_marks: int) -> float:
-        """
-        Apply external length penalty to LLM score based on length ratio.
-        
-        Args:
-            llm_score: Score from LLM (0 to max_marks)
-            length_ratio: Length ratio as percentage (0-100+)
-            max_marks: Maximum marks for the question
-            
-        Returns:
-            Final score after applying length penalty
-        """
-        # Convert LLM score to percentage for easier calculation
-        llm_percentage = (llm_score / max_marks) * 100
-        
-        # Apply length penalty rules (more lenient thresholds)
-        if length_ratio < 5:
-            # Less than 5% of reference length: MAXIMUM 30%
-            max_allowed_percentage = 30
-        elif length_ratio < 15:
-            # Less than 15% of reference length: MAXIMUM 50%
-            max_allowed_percentage = 50
-        elif length_ratio < 25:
-            # Less than 25% of reference length: MAXIMUM 70%
-            max_allowed_percentage = 70
-        else:
-            # 25% or more: No length penalty
-            max_allowed_percentage = 100
-        
-        # Apply the penalty
-        final_percentage = min(llm_percentage, max_allowed_percentage)
-        
-        # Convert back to max_marks scale
-        final_score = (final_percentage / 100) * max_marks
-        
-        return final_score
+    def close(self):
+        """Close the pooled HTTP session and the persistent cache."""
+        session = getattr(self, 'session', None)
+        if session is not None:
+            session.close()
+        cache_db = getattr(self, '_cache_db', None)
+        if cache_db is not None:
+            cache_db.close()
+            self._cache_db = None
+    
+    def __del__(self):
+        self.close()
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model and system status."""
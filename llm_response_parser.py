@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+LLM Response Parser
+===================
+
+Parses the "Score: ... / Reason: ..." text returned by the LLM evaluator.
+
+This module is kept free of the rest of the evaluator (no requests, no model
+state) and uses only primitive types so it can optionally be compiled ahead
+of time with mypyc for a faster parse:
+
+    pip install mypy && mypyc llm_response_parser.py
+
+The compiled extension is picked up automatically by the normal import; the
+pure Python module works unchanged when it is not built.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# orjson is optional - it parses JSON-mode responses faster than the json module.
+# Only the loads function is kept so the module still type-checks (and compiles with mypyc).
+_json_loads: Callable[..., Any]
+try:
+    import orjson  # type: ignore[import]  # optional, may be absent where mypyc runs
+    _json_loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _json_loads = json.loads
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Patterns used to parse plain-text LLM responses (models that ignore JSON mode);
+# tolerant of case and markdown emphasis such as "**Score:** 85%"
+_RE_SCORE = re.compile(r'score[*_\s]*:[*_\s]*(\d+(?:\.\d+)?)\s*(%?)', re.IGNORECASE)
+_RE_SCORE_LABEL = re.compile(r'score[*_\s]*:', re.IGNORECASE)
+_RE_PERCENTAGE_PHRASE = re.compile(r'percentage score of.*?(\d+(?:\.\d+)?)%', re.IGNORECASE)
+_RE_REASON = re.compile(r'[*_\s]*(?:reason|explanation)[*_\s]*:[*_\s]*(.*)', re.IGNORECASE)
+
+# Patterns for packed responses ("Score 2: 85%" / "Reason 2: ...")
+_RE_INDEXED_SCORE = re.compile(r'Score\s*(\d+)\s*:\s*(\d+(?:\.\d+)?)\s*%?')
+_RE_INDEXED_REASON = re.compile(r'Reason\s*(\d+)\s*:\s*(.*)')
+
+
+def parse_llm_response(response: str, max_marks: float) -> Tuple[float, str]:
+    """
+    Parse the LLM response to extract score and explanation.
+    
+    Args:
+        response: Raw response from LLM
+        max_marks: Maximum possible marks
+        
+    Returns:
+        Tuple of (score, explanation); the score is 0 if none could be parsed
+    """
+    parsed = try_parse_llm_response(response, max_marks)
+    if parsed is None:
+        return 0.0, "No explanation provided"
+    return parsed
+
+
+def try_parse_llm_response(response: str, max_marks: float) -> Optional[Tuple[float, str]]:
+    """
+    Parse the LLM response to extract score and explanation.
+    
+    Args:
+        response: Raw response from LLM
+        max_marks: Maximum possible marks
+        
+    Returns:
+        Tuple of (score, explanation), or None if the response contains no
+        parseable score (e.g. a JSON object cut off by the token limit)
+    """
+    json_result = _parse_json_response(response, max_marks)
+    if json_result is not None:
+        return json_result
+    
+    score: float = 0.0
+    score_found: bool = False
+    explanation: str = "No explanation provided"
+    
+    for raw_line in response.splitlines():
+        line: str = raw_line.strip()
+        
+        # Checked first so a reason that mentions a "score:" does not overwrite the score
+        reason_match = _RE_REASON.match(line)
+        if reason_match:
+            # Extract reason - single line explanation
+            explanation = reason_match.group(1).strip()
+            continue
+        
+        score_match = _RE_SCORE.search(line)
+        if score_match:
+            # Handles "Score: 85%", "Score: 85" and "... Score: 85%" in the middle of a line
+            score = float(score_match.group(1))
+            # Percentages, and direct scores > 100, are converted to the max_marks scale
+            if score_match.group(2) or score > 100:
+                score = (score / 100.0) * max_marks
+            # Ensure score is within valid range
+            score = max(0.0, min(score, float(max_marks)))
+            score_found = True
+            continue
+        
+        percentage_match = _RE_PERCENTAGE_PHRASE.search(line)
+        if percentage_match:
+            # Handle case where LLM says "I would give a percentage score of X%"
+            score = (float(percentage_match.group(1)) / 100.0) * max_marks
+            score = max(0.0, min(score, float(max_marks)))
+            score_found = True
+            continue
+        
+        if _RE_SCORE_LABEL.search(line):
+            logger.warning(f"Could not parse score: {line}")
+            score = 0.0
+            score_found = False
+    
+    if not score_found:
+        return None
+    return score, explanation
+
+
+def _parse_json_response(response: str, max_marks: float) -> Optional[Tuple[float, str]]:
+    """
+    Parse a JSON-mode response ({"score": <percentage>, "explanation": "..."}).
+    
+    Returns:
+        Tuple of (score, explanation), or None if the response is not such an object
+    """
+    text: str = response.strip()
+    if not text.startswith('{'):
+        return None
+    
+    try:
+        data = _json_loads(text)
+        percentage = float(data['score'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    
+    explanation = str(data.get('explanation') or data.get('reason') or "No explanation provided").strip()
+    score = max(0.0, min((percentage / 100.0) * max_marks, float(max_marks)))
+    return score, explanation
+
+
+def split_packed_llm_response(response: str, count: int) -> List[str]:
+    """
+    Split a packed response covering several numbered answers into one
+    "Score: X%\\nReason: ..." response per answer.
+    
+    Args:
+        response: Raw packed response from LLM
+        count: Number of answers that were packed into the prompt
+        
+    Returns:
+        count responses in answer order, or an empty list if any answer's
+        score is missing (the caller then evaluates the answers individually)
+    """
+    scores: Dict[int, str] = {}
+    reasons: Dict[int, str] = {}
+    
+    for raw_line in response.splitlines():
+        line: str = raw_line.strip()
+        
+        score_match = _RE_INDEXED_SCORE.match(line)
+        if score_match:
+            scores[int(score_match.group(1))] = score_match.group(2)
+            continue
+        
+        reason_match = _RE_INDEXED_REASON.match(line)
+        if reason_match:
+            reasons[int(reason_match.group(1))] = reason_match.group(2).strip()
+    
+    if len(scores) != count or any(number not in scores for number in range(1, count + 1)):
+        return []
+    
+    return [
+        f"Score: {scores[number]}%\nReason: {reasons.get(number, 'No explanation provided')}"
+        for number in range(1, count + 1)
+    ]
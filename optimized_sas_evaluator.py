@@ -8,12 +8,95 @@ from sentence_transformers import SentenceTransformer
 import numpy as np
 import sys
 import os
-from typing import List, Tuple, Dict, Any
+import contextlib
+import functools
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Dict, Any
+
+# torch comes with sentence-transformers; it is only used directly for inference mode and quantization
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    torch = None
+    TORCH_AVAILABLE = False
+
+# batched is optional - it merges concurrent encode calls into one model pass
+try:
+    import batched
+    BATCHED_AVAILABLE = True
+except ImportError:
+    batched = None
+    BATCHED_AVAILABLE = False
+
+# ONNX Runtime is optional - with it, quantize=True uses an int8-quantized export of the model on CPU
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ORTModelForFeatureExtraction = None
+    AutoTokenizer = None
+    ONNX_AVAILABLE = False
+
+# Quantized ONNX export of the model, created by `python setup.py --export-onnx`
+ONNX_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache', 'mpnet-onnx')
+ONNX_MODEL_FILE = 'model_quantized.onnx'
+
+# Reference answer embeddings are persisted in their own SQLite file in the instance folder,
+# not in the application database, so the app's own writes never wait on this cache
+EMBEDDING_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ref_embeddings.sqlite')
+
+@functools.lru_cache(maxsize=4)
+def _get_sentence_transformer(model_name: str, device: str, quantize: bool = False) -> Tuple[SentenceTransformer, bool]:
+    """
+    Load a SentenceTransformer once per process and share it between PrimaryFilter instances.
+    
+    Args:
+        model_name: Name of the SentenceTransformer model
+        device: Device to run the model on
+        quantize: On CPU, quantize the Linear layers to int8
+    
+    Returns:
+        Tuple of (model, whether its weights were quantized to int8)
+    """
+    model = SentenceTransformer(model_name, device=device)
+    if device.startswith("cuda"):
+        # Half precision doubles GPU throughput; embeddings are normalized so fp16 is plenty
+        model.half()
+    if device != "cpu" or not quantize:
+        return model, False
+    
+    # Dynamic int8 quantization of the Linear layers roughly halves CPU inference time,
+    # but similarities move by about 1%, which can flip answers near the filter threshold
+    try:
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model, True
+    except Exception as e:
+        print(f"Dynamic quantization not available, using full precision: {e}")
+        return model, False
+
+@functools.lru_cache(maxsize=1)
+def _get_onnx_model(model_dir: str, file_name: str) -> Tuple[Any, Any]:
+    """Load the quantized ONNX model and its tokenizer once per process."""
+    return (
+        ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=file_name),
+        AutoTokenizer.from_pretrained(model_dir)
+    )
 
 class PrimaryFilter:
     """Primary filter for answer quality assessment integrated with exam system."""
     
-    def __init__(self, device: str = "cpu", threshold: float = 0.6, max_marks: int = 10):
+    # Quality categories for raw scores in [0, 0.4), [0.4, 0.6), [0.6, 0.8) and [0.8, ...)
+    _CATEGORY_BINS = np.array([0.4, 0.6, 0.8])
+    _CATEGORIES = np.array(["Poor", "Fair", "Good", "Excellent"], dtype=object)
+    _FILTERED_CATEGORY = "Filtered (Irrelevant)"
+    
+    def __init__(self, device: str = "cpu", threshold: float = 0.6, max_marks: int = 10,
+                 embedding_db_path: str = EMBEDDING_DB_PATH, quantize: bool = False):
         """
         Initialize the primary filter system.
         
@@ -21,23 +104,78 @@ class PrimaryFilter:
             device: Device to run the model on ("cpu" or "cuda")
             threshold: Minimum similarity threshold (scores below this become 0)
             max_marks: Maximum marks for scaling (default 10 for compatibility)
+            embedding_db_path: SQLite database where reference embeddings are persisted (None disables)
+            quantize: Use an int8 model on CPU - the ONNX export if present, else the PyTorch model
+                      quantized dynamically (faster, but similarities shift slightly)
         """
         self.device = device
+        self.quantize = quantize
         self.model = None
+        self.ort_model = None
+        self.tokenizer = None
+        self.backend = None  # Set when the model is loaded (see get_model_info)
         self.model_name = "all-mpnet-base-v2"
-        self.batch_size = 8
+        # A GPU only gets busy with large batches; on CPU larger batches just add padding
+        self.batch_size = 128 if device.startswith("cuda") else 32
         self.threshold = threshold
         self.max_marks = max_marks
+        self.batch_timeout_ms = 20  # How long concurrent encode calls wait to be merged
+        self._encode_batched = None
+        
+        # The model is loaded on first use (or by ensure_model_loaded) so construction is instant
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
+        
+        # Reference answers are the same for every student, so their embeddings are cached
+        # (as float16 to halve the memory; they are upcast before use)
+        self.reference_cache_size = 1024
+        self._reference_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._reference_cache_lock = threading.Lock()
+        
+        # Similarities are deterministic per (student, reference) pair, so re-grading reuses them
+        self.score_cache_size = 4096
+        self._score_cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._score_cache_lock = threading.Lock()
+        
+        # ...and persisted, so a restart doesn't re-encode every exam's references.
+        # The connection is opened on first use so it is never shared across a fork.
+        self.embedding_db_path = embedding_db_path
+        self._embedding_db = None
+        self._embedding_db_lock = threading.Lock()
         
         print(f"Initializing Primary Filter System - Threshold: {self.threshold}, Max marks: {self.max_marks}")
-        self._load_model()
+    
+    def ensure_model_loaded(self):
+        """Load the model if it hasn't been loaded yet (safe to call from several threads)."""
+        if self._model_loaded:
+            return
+        
+        with self._model_lock:
+            if not self._model_loaded:
+                self._load_model()
+                self._model_loaded = True
     
     def _load_model(self):
         """Load and configure the optimal model."""
         try:
-            # Load model using SentenceTransformer
-            print(f"Loading model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name, device=self.device)
+            if (self.quantize and self.device == "cpu" and ONNX_AVAILABLE
+                    and os.path.isfile(os.path.join(ONNX_MODEL_DIR, ONNX_MODEL_FILE))):
+                # Use the int8-quantized ONNX export (roughly twice as fast on CPU, but like
+                # dynamic quantization it moves similarities by about 1%)
+                print(f"Loading quantized ONNX model: {ONNX_MODEL_DIR}")
+                self.ort_model, self.tokenizer = _get_onnx_model(ONNX_MODEL_DIR, ONNX_MODEL_FILE)
+                self.backend = 'onnxruntime-int8'
+            else:
+                # Load model using SentenceTransformer
+                print(f"Loading model: {self.model_name}")
+                self.model, quantized = _get_sentence_transformer(self.model_name, self.device, self.quantize)
+                self.backend = 'sentence-transformers-int8' if quantized else 'sentence-transformers'
+            
+            # Coalesce encode calls arriving at the same time from different threads
+            if BATCHED_AVAILABLE:
+                self._encode_batched = batched.dynamically(
+                    self._encode, batch_size=self.batch_size, timeout_ms=self.batch_timeout_ms
+                )
             
             print("Model loaded and configured successfully")
             print("PrimaryFilter initialized successfully")
@@ -62,22 +200,36 @@ class PrimaryFilter:
         Returns:
             Dictionary containing final_score and details for compatibility
         """
-        if not student_answer or not student_answer.strip():
-            return {
-                'final_score': 0.0,
-                'details': {
-                    'raw_score': 0.0,
-                    'filtered': True,
-                    'reason': 'Empty answer',
-                    'threshold': self.threshold,
-                    'category': 'Filtered',
-                    'model_name': self.model_name
-                }
-            }
+        if not student_answer or student_answer.isspace():
+            return self._empty_result()
         
         # Get raw similarity score from the model
-        raw_score = self._compute_similarity(reference_answer, student_answer)
+        raw_score = self._compute_similarity(student_answer, reference_answer)
         
+        return self._build_result(raw_score)
+    
+    def _empty_result(self) -> Dict[str, Any]:
+        """Result for an empty answer."""
+        return {
+            'final_score': 0.0,
+            'details': {
+                'raw_score': 0.0,
+                'filtered': True,
+                'reason': 'Empty answer',
+                'threshold': self.threshold,
+                'category': 'Filtered',
+                'model_name': self.model_name
+            }
+        }
+    
+    def _build_result(self, raw_score: float, category: str = None) -> Dict[str, Any]:
+        """
+        Apply threshold filtering and scaling to a raw similarity score.
+        
+        Args:
+            raw_score: Cosine similarity between student and reference answer
+            category: Precomputed quality category (see _quality_categories), if any
+        """
         # Apply threshold filtering - let the model's semantic understanding do the work
         if raw_score < self.threshold:
             final_score = 0.0
@@ -90,7 +242,8 @@ class PrimaryFilter:
             reason = "Passed threshold"
         
         # Determine quality category
-        category = self._get_quality_category(raw_score, filtered)
+        if category is None:
+            category = self._get_quality_category(raw_score, filtered)
         
         return {
             'final_score': final_score,
@@ -104,13 +257,15 @@ class PrimaryFilter:
             }
         }
     
-    def evaluate_batch(self, student_answers: List[str], reference_answers: List[str]) -> Dict[str, Any]:
+    def evaluate_batch(self, student_answers: List[str], reference_answers: List[str],
+                       student_embeddings: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Evaluate multiple answer pairs for detailed analysis.
         
         Args:
             student_answers: List of student answers
             reference_answers: List of reference answers
+            student_embeddings: Embeddings of the student answers from embed(), if already computed
             
         Returns:
             Dictionary containing detailed results
@@ -118,12 +273,24 @@ class PrimaryFilter:
         if len(student_answers) != len(reference_answers):
             raise ValueError("Number of student answers must match reference answers")
         
+        # Encode all non-empty answers in a single model pass
+        scored_indices = [i for i, answer in enumerate(student_answers) if answer and not answer.isspace()]
+        raw_scores = self.score_batch(
+            [student_answers[i] for i in scored_indices],
+            [reference_answers[i] for i in scored_indices],
+            None if student_embeddings is None else student_embeddings[scored_indices]
+        )
+        raw_score_by_index = dict(zip(scored_indices, zip(raw_scores.tolist(), self._quality_categories(raw_scores))))
+        
         results = []
         total_score = 0.0
         filtered_count = 0
         
-        for i, (student_answer, reference_answer) in enumerate(zip(student_answers, reference_answers)):
-            result = self.evaluate(student_answer, reference_answer)
+        for i in range(len(student_answers)):
+            if i in raw_score_by_index:
+                result = self._build_result(*raw_score_by_index[i])
+            else:
+                result = self._empty_result()
             results.append(result)
             total_score += result['final_score']
             if result['details']['filtered']:
@@ -142,10 +309,15 @@ class PrimaryFilter:
             }
         }
     
+    def _quality_categories(self, raw_scores: np.ndarray) -> List[str]:
+        """Quality categories for many raw scores at once (vectorized _get_quality_category)."""
+        categories = self._CATEGORIES[np.digitize(raw_scores, self._CATEGORY_BINS)]
+        return np.where(raw_scores < self.threshold, self._FILTERED_CATEGORY, categories).tolist()
+    
     def _get_quality_category(self, raw_score: float, filtered: bool) -> str:
         """Determine quality category based on raw score."""
         if filtered:
-            return "Filtered (Irrelevant)"
+            return self._FILTERED_CATEGORY
         elif raw_score >= 0.8:
             return "Excellent"
         elif raw_score >= 0.6:
@@ -155,27 +327,325 @@ class PrimaryFilter:
         else:
             return "Poor"
     
-    def _compute_similarity(self, text1: str, text2: str) -> float:
-        """Compute similarity between two texts using the model."""
+    def score_batch(self, student_answers: List[str], reference_answers: List[str],
+                    student_embeddings: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compute cosine similarities for many answer pairs with one encode call.
+        
+        Args:
+            student_answers: List of student answers
+            reference_answers: List of reference answers
+            student_embeddings: Embeddings of the student answers from embed(), if already computed
+            
+        Returns:
+            Array of similarity scores, one per pair
+        """
+        if not student_answers:
+            return np.zeros(0)
+        
+        # Outside the try: a model that fails to load must not turn every answer into a 0
+        self.ensure_model_loaded()
+        
         try:
-            # Get embeddings using SentenceTransformer
-            embeddings = self.model.encode([text1, text2])
+            # Pairs scored before are served from the score cache; only the rest are encoded
+            keys = [self._pair_key(student, reference) for student, reference in zip(student_answers, reference_answers)]
+            with self._score_cache_lock:
+                scores = [self._score_cache.get(key) for key in keys]
+            
+            missing = [i for i, score in enumerate(scores) if score is None]
+            if missing:
+                computed = self._compute_scores(
+                    [student_answers[i] for i in missing], [reference_answers[i] for i in missing],
+                    None if student_embeddings is None else student_embeddings[missing]
+                ).tolist()
+                with self._score_cache_lock:
+                    for i, score in zip(missing, computed):
+                        scores[i] = self._score_cache[keys[i]] = score
+                    while len(self._score_cache) > self.score_cache_size:
+                        self._score_cache.popitem(last=False)
             
-            # Compute cosine similarity
-            similarity = np.dot(embeddings[0], embeddings[1]) / (np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1]))
+            return np.array(scores)
             
-            return float(similarity)
-                
         except Exception as e:
-            print(f"Error computing similarity: {e}")
-            return 0.0
+            print(f"Error computing batch similarity: {e}")
+            return np.zeros(len(student_answers))
+    
+    def _compute_scores(self, student_answers: List[str], reference_answers: List[str],
+                        student_embeddings: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarities for answer pairs, encoding everything not cached in one call."""
+        missing_references = self._missing_references(reference_answers)
+        if student_embeddings is None:
+            # Encode each distinct student answer once, together with any reference
+            # answers that are not cached yet
+            unique_students = list(dict.fromkeys(student_answers))
+            embeddings = self.embed(unique_students + missing_references)
+            self._store_reference_embeddings(missing_references, embeddings[len(unique_students):])
+            
+            student_index = {text: i for i, text in enumerate(unique_students)}
+            student_embeddings = embeddings[[student_index[text] for text in student_answers]]
+        elif missing_references:
+            self._store_reference_embeddings(missing_references, self.embed(missing_references))
+        
+        reference_embeddings = self._reference_embeddings(reference_answers)
+        
+        # Embeddings are unit length, so the row-wise dot product is the cosine similarity
+        # (einsum computes it without materializing the elementwise product)
+        return np.einsum('ij,ij->i', student_embeddings, reference_embeddings)
+    
+    def _pair_key(self, student_answer: str, reference_answer: str) -> bytes:
+        """Score cache key for a (student, reference) pair."""
+        digest = hashlib.blake2b(self._reference_key(reference_answer), digest_size=16)
+        digest.update(student_answer.encode('utf-8'))
+        return digest.digest()
+    
+    def cache_reference_embeddings(self, reference_answers: List[str]):
+        """
+        Pre-compute embeddings for reference answers (e.g. all questions of an exam).
+        
+        Args:
+            reference_answers: Reference answers to cache
+        """
+        missing_references = self._missing_references(reference_answers)
+        if missing_references:
+            self._store_reference_embeddings(missing_references, self.embed(missing_references))
+    
+    def _reference_key(self, reference_answer: str) -> bytes:
+        """Cache key for a reference answer (embeddings differ between models and backends)."""
+        return hashlib.blake2b(
+            f"{self.model_name}|{self.backend}|{reference_answer}".encode('utf-8'), digest_size=16
+        ).digest()
+    
+    def _missing_references(self, reference_answers: List[str]) -> List[str]:
+        """Distinct reference answers that have no cached embedding, in memory or on disk."""
+        # The cache key depends on the backend, which is only known once the model is loaded
+        self.ensure_model_loaded()
+        
+        keys = {self._reference_key(text): text for text in dict.fromkeys(reference_answers)}
+        with self._reference_cache_lock:
+            missing = {key: text for key, text in keys.items() if key not in self._reference_cache}
+        
+        persisted = self._load_persisted_embeddings(list(missing))
+        if persisted:
+            self._cache_reference_embeddings(persisted)
+        return [text for key, text in missing.items() if key not in persisted]
+    
+    def _store_reference_embeddings(self, reference_answers: List[str], embeddings: np.ndarray):
+        """Add reference answer embeddings to the LRU cache and the persistent cache."""
+        entries = {
+            self._reference_key(text): embedding.astype(np.float16)
+            for text, embedding in zip(reference_answers, embeddings)
+        }
+        self._cache_reference_embeddings(entries)
+        self._persist_embeddings(entries)
+    
+    def _cache_reference_embeddings(self, entries: Dict[bytes, np.ndarray]):
+        """Add float16 embeddings to the in-memory LRU cache."""
+        with self._reference_cache_lock:
+            # update() keeps existing keys in place, so move them to the most recently used end first
+            for key in entries:
+                if key in self._reference_cache:
+                    self._reference_cache.move_to_end(key)
+            self._reference_cache.update(entries)
+            while len(self._reference_cache) > self.reference_cache_size:
+                self._reference_cache.popitem(last=False)
+    
+    def _get_embedding_db(self):
+        """Open (and create if needed) the persistent embedding cache; None if it is disabled."""
+        if self._embedding_db is None and self.embedding_db_path:
+            try:
+                os.makedirs(os.path.dirname(self.embedding_db_path) or '.', exist_ok=True)
+                connection = sqlite3.connect(self.embedding_db_path, isolation_level=None, check_same_thread=False)
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS ref_embeddings (sha BLOB PRIMARY KEY, emb BLOB NOT NULL)'
+                )
+                self._embedding_db = connection
+            except sqlite3.Error as e:
+                print(f"Persistent embedding cache disabled, could not open {self.embedding_db_path}: {e}")
+                self.embedding_db_path = None
+        return self._embedding_db
+    
+    def _load_persisted_embeddings(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Look up float16 embeddings in the persistent cache."""
+        if not keys:
+            return {}
+        
+        try:
+            with self._embedding_db_lock:
+                connection = self._get_embedding_db()
+                if connection is None:
+                    return {}
+                rows = connection.execute(
+                    f"SELECT sha, emb FROM ref_embeddings WHERE sha IN ({','.join('?' * len(keys))})", keys
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading persistent embedding cache: {e}")
+            return {}
+        
+        return {bytes(sha): np.frombuffer(emb, dtype=np.float16).copy() for sha, emb in rows}
+    
+    def _persist_embeddings(self, entries: Dict[bytes, np.ndarray]):
+        """Write float16 embeddings to the persistent cache."""
+        if not entries:
+            return
+        
+        try:
+            with self._embedding_db_lock:
+                connection = self._get_embedding_db()
+                if connection is not None:
+                    connection.executemany(
+                        'INSERT OR IGNORE INTO ref_embeddings (sha, emb) VALUES (?, ?)',
+                        [(key, embedding.tobytes()) for key, embedding in entries.items()]
+                    )
+        except sqlite3.Error as e:
+            print(f"Error writing persistent embedding cache: {e}")
+    
+    def _reference_embeddings(self, reference_answers: List[str]) -> np.ndarray:
+        """Embeddings for reference answers, from the cache where possible."""
+        with self._reference_cache_lock:
+            rows = []
+            for text in reference_answers:
+                key = self._reference_key(text)
+                embedding = self._reference_cache.get(key)
+                if embedding is not None:
+                    self._reference_cache.move_to_end(key)
+                rows.append(embedding)
+        
+        # Anything evicted in the meantime is encoded again
+        missing = [text for text, embedding in zip(reference_answers, rows) if embedding is None]
+        if missing:
+            missing_embeddings = dict(zip(missing, self.embed(missing)))
+            rows = [missing_embeddings[text] if embedding is None else embedding
+                    for text, embedding in zip(reference_answers, rows)]
+        
+        return np.stack(rows).astype(np.float32)
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts into unit-length embeddings (dot product = cosine similarity).
+        
+        Args:
+            texts: List of texts to encode
+            
+        Returns:
+            Array of shape (len(texts), embedding_dim)
+        """
+        self.ensure_model_loaded()
+        
+        texts = list(texts)
+        if self._encode_batched is not None and texts:
+            return np.stack(self._encode_batched(texts))
+        return np.asarray(self._encode(texts))
+    
+    def _encode(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode a batch of texts into unit-length embeddings, one array per text."""
+        if self.ort_model is not None:
+            return list(self._encode_onnx(texts))
+        
+        # inference_mode also skips the version counting and view tracking that no_grad keeps.
+        # It is thread-local, so it is entered here, on the thread that runs the model.
+        with torch.inference_mode() if TORCH_AVAILABLE else contextlib.nullcontext():
+            return list(self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ))
+    
+    def _encode_onnx(self, texts: List[str]) -> np.ndarray:
+        """Encode texts with the ONNX model: mean pooling over tokens, then L2 normalization."""
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + self.batch_size], padding=True, truncation=True, max_length=384, return_tensors='np'
+            )
+            token_embeddings = np.asarray(self.ort_model(**inputs).last_hidden_state)
+            mask = inputs['attention_mask'][..., np.newaxis].astype(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            embeddings.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        
+        return np.concatenate(embeddings) if embeddings else np.zeros((0, 0))
+    
+    def _compute_similarity(self, student_answer: str, reference_answer: str) -> float:
+        """Compute similarity between a student answer and a (cached) reference answer."""
+        return float(self.score_batch([student_answer], [reference_answer])[0])
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the loaded model."""
         return {
             'model_name': self.model_name,
             'device': self.device,
+            'backend': self.backend,
             'batch_size': self.batch_size,
             'threshold': self.threshold,
             'max_marks': self.max_marks
-        }
\ No newline at end of file
+        }
+    
+    def test_quantization(self, student_answers: List[str] = None, reference_answers: List[str] = None) -> Dict[str, Any]:
+        """
+        Check that the int8 model (quantize=True) puts answers in the same categories as full precision.
+        
+        int8 moves similarities by about 1%, which can flip answers near the threshold,
+        so run this on representative answers before enabling quantize=True.
+        
+        Args:
+            student_answers: Answers to compare (defaults to sample answers of varying relevance)
+            reference_answers: Matching reference answers
+            
+        Returns:
+            Test results, with the pairs whose category or filter decision differ
+        """
+        if student_answers is None:
+            reference = ("Photosynthesis is the process by which plants convert light energy into chemical energy, "
+                         "using carbon dioxide and water to produce glucose and oxygen.")
+            student_answers = [
+                "Photosynthesis is how plants make food using sunlight, water, and carbon dioxide.",
+                "Plants need sunlight to grow.",
+                "Leaves are green because of chlorophyll.",
+                "Animals breathe in oxygen and breathe out carbon dioxide.",
+                "Energy cannot be created or destroyed.",
+                "Water boils at 100 degrees Celsius.",
+                "The mitochondria is the powerhouse of the cell.",
+                "I don't know the answer to this question."
+            ]
+            reference_answers = [reference] * len(student_answers)
+        
+        results = {}
+        for quantize in (False, True):
+            primary_filter = PrimaryFilter(device=self.device, threshold=self.threshold, max_marks=self.max_marks,
+                                           embedding_db_path=None, quantize=quantize)
+            results[quantize] = primary_filter.evaluate_batch(student_answers, reference_answers)['results']
+            backend = primary_filter.backend
+        
+        mismatches = []
+        near_threshold = 0
+        for student, reference, full, quantized in zip(student_answers, reference_answers, results[False], results[True]):
+            full_details, quantized_details = full['details'], quantized['details']
+            if abs(full_details['raw_score'] - self.threshold) < 0.05:
+                near_threshold += 1
+            if (full_details['category'] != quantized_details['category']
+                    or full_details['filtered'] != quantized_details['filtered']):
+                mismatches.append({
+                    'student_answer': student,
+                    'reference_answer': reference,
+                    'full_precision': (full_details['raw_score'], full_details['category']),
+                    'quantized': (quantized_details['raw_score'], quantized_details['category'])
+                })
+        
+        return {
+            'quantized_backend': backend,
+            'pairs': len(student_answers),
+            'near_threshold': near_threshold,  # Pairs within 0.05 of the threshold in full precision
+            'mismatches': mismatches,
+            'passed': not mismatches
+        }
+
+
+# Example usage and testing
+if __name__ == "__main__":
+    import json
+    
+    # Compare full precision and int8 categories around the filter threshold LLMEvaluator uses
+    primary_filter = PrimaryFilter(threshold=0.3)
+    print("Model Info:", primary_filter.get_model_info())
+    print("Quantization check:", json.dumps(primary_filter.test_quantization(), indent=2))
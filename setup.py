@@ -4,6 +4,7 @@ Setup script for AI Exam System
 This script helps set up the application for first-time use.
 """
 
+import importlib.util
 import os
 import sys
 import subprocess
@@ -37,10 +38,10 @@ def check_dependencies():
     missing_packages = []
     
     for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
+        # Only locate the package; importing it (e.g. sentence-transformers) is slow
+        if importlib.util.find_spec(package.replace('-', '_')) is not None:
             print(f"   ✅ {package}")
-        except ImportError:
+        else:
             missing_packages.append(package)
             print(f"   ❌ {package}")
     
@@ -75,6 +76,35 @@ def create_directories():
     
     print("✅ Directories created successfully!")
 
+def export_onnx_model():
+    """Export the PrimaryFilter model to ONNX and quantize it to int8 (optional)."""
+    print("\n🧠 Exporting quantized ONNX model...")
+    
+    output_dir = Path('model_cache') / 'mpnet-onnx'
+    quantized_model = output_dir / 'model_quantized.onnx'
+    if quantized_model.exists():
+        print(f"✅ Quantized model already exists: {quantized_model}")
+        return True
+    
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        from transformers import AutoTokenizer
+    except ImportError:
+        print("⚠️  optimum[onnxruntime] not installed - skipping (the PyTorch model will be used)")
+        return False
+    
+    try:
+        model_id = 'sentence-transformers/all-mpnet-base-v2'
+        ORTModelForFeatureExtraction.from_pretrained(model_id, export=True).save_pretrained(output_dir)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+        quantize_dynamic(str(output_dir / 'model.onnx'), str(quantized_model), weight_type=QuantType.QInt8)
+        print(f"✅ Quantized model exported: {quantized_model}")
+        return True
+    except Exception as e:
+        print(f"⚠️  ONNX export failed: {e} (the PyTorch model will be used)")
+        return False
+
 def setup_database():
     """Set up the database."""
     print("\n🗄️  Setting up database...")
@@ -84,20 +114,24 @@ def setup_database():
     
     try:
         conn = sqlite3.connect(db_path)
+        
+        # WAL lets the application read while it writes and makes commits cheaper
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        
         cursor = conn.cursor()
         
         # Create tables (simplified version for SQLite)
-        cursor.execute('''
+        cursor.executescript('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,
                 password TEXT NOT NULL,
                 role TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
+            );
+            
             CREATE TABLE IF NOT EXISTS exams (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT NOT NULL,
@@ -105,10 +139,8 @@ def setup_database():
                 is_enabled BOOLEAN DEFAULT 0,
                 threshold REAL DEFAULT 0.6,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
+            );
+            
             CREATE TABLE IF NOT EXISTS questions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 exam_id INTEGER,
@@ -117,10 +149,8 @@ def setup_database():
                 max_marks INTEGER NOT NULL,
                 question_order INTEGER DEFAULT 0,
                 FOREIGN KEY (exam_id) REFERENCES exams (id)
-            )
-        ''')
-        
-        cursor.execute('''
+            );
+            
             CREATE TABLE IF NOT EXISTS results (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 exam_id INTEGER,
@@ -133,21 +163,28 @@ def setup_database():
                 FOREIGN KEY (exam_id) REFERENCES exams (id),
                 FOREIGN KEY (student_id) REFERENCES users (id),
                 FOREIGN KEY (question_id) REFERENCES questions (id)
-            )
+            );
+            
+            CREATE INDEX IF NOT EXISTS idx_results_exam_student ON results (exam_id, student_id);
         ''')
         
-        # Create default users
+        # Create default users (only hashing passwords for users that don't exist yet)
         from werkzeug.security import generate_password_hash
         
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, password, role)
-            VALUES (?, ?, ?)
-        ''', ('admin', generate_password_hash('admin123'), 'admin'))
+        default_users = [
+            ('admin', 'admin123', 'admin'),
+            ('student', 'student123', 'student'),
+        ]
+        existing_usernames = {row[0] for row in cursor.execute('SELECT username FROM users')}
         
-        cursor.execute('''
+        cursor.executemany('''
             INSERT OR IGNORE INTO users (username, password, role)
             VALUES (?, ?, ?)
-        ''', ('student', generate_password_hash('student123'), 'student'))
+        ''', [
+            (username, generate_password_hash(password), role)
+            for username, password, role in default_users
+            if username not in existing_usernames
+        ])
         
         conn.commit()
         conn.close()
@@ -230,6 +267,10 @@ def main():
     # Create directories
     create_directories()
     
+    # Export the quantized embedding model only when asked - it is used by PrimaryFilter(quantize=True)
+    if '--export-onnx' in sys.argv[1:]:
+        export_onnx_model()
+    
     # Setup database
     if not setup_database():
         print("❌ Setup failed. Please check database configuration.")
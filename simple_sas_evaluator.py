@@ -4,20 +4,121 @@ Simple SAS Evaluator using basic text similarity
 """
 
 import re
-from typing import Dict, Any
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, List, FrozenSet, Optional, Tuple
 from difflib import SequenceMatcher
 
+# RapidFuzz is optional - its C++ Indel similarity is an upper bound on SequenceMatcher.ratio()
+# (the longest common subsequence is at least as long as SequenceMatcher's matching blocks),
+# so passes_threshold can reject pairs without running SequenceMatcher
+try:
+    from rapidfuzz.distance import Indel
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    Indel = None
+    RAPIDFUZZ_AVAILABLE = False
+
+# Numba is optional - with it, ASCII answers are cleaned by a compiled byte loop instead of regexes
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# ASCII characters that _PUNCTUATION_RE removes, for the str.translate fast path
+_ASCII_PUNCTUATION_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128)) if not (c.isalnum() or c == '_' or c.isspace())
+))
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _clean_ascii_bytes(buf: np.ndarray) -> np.ndarray:
+        """
+        Byte-level equivalent of _clean_text for ASCII input: lowercase, strip, collapse
+        whitespace runs into one space and drop everything that isn't [a-z0-9_].
+        """
+        n = buf.shape[0]
+        out = np.empty(n, dtype=np.uint8)
+        
+        # Whitespace as matched by str.strip() and \s: \t\n\v\f\r, \x1c-\x1f and space
+        start = 0
+        while start < n and (buf[start] == 32 or 9 <= buf[start] <= 13 or 28 <= buf[start] <= 31):
+            start += 1
+        end = n
+        while end > start and (buf[end - 1] == 32 or 9 <= buf[end - 1] <= 13 or 28 <= buf[end - 1] <= 31):
+            end -= 1
+        
+        size = 0
+        in_whitespace = False
+        for i in range(start, end):
+            c = buf[i]
+            if c == 32 or 9 <= c <= 13 or 28 <= c <= 31:
+                if not in_whitespace:
+                    out[size] = 32
+                    size += 1
+                    in_whitespace = True
+                continue
+            
+            # Punctuation is removed after whitespace is collapsed, so it ends a whitespace run
+            in_whitespace = False
+            if 65 <= c <= 90:
+                out[size] = c | 0x20
+                size += 1
+            elif 97 <= c <= 122 or 48 <= c <= 57 or c == 95:
+                out[size] = c
+                size += 1
+        return out[:size]
+
+# int.bit_count (a hardware popcount) needs Python 3.10
+_popcount = getattr(int, 'bit_count', None) or (lambda mask: bin(mask).count('1'))
+
+# Cleaned text with its words and length (see _clean_and_tokenize)
+CleanedText = Tuple[str, List[str], int]
+
+# A cleaned reference answer with its word set, the bit of each of its words (see _word_mask) and length
+PreparedReference = Tuple[str, FrozenSet[str], Dict[str, int], int]
+
 class SimpleSASEvaluator:
     """Simple SAS evaluator using basic text similarity metrics."""
     
     def __init__(self, threshold: float = 0.15, max_marks: int = 10):
+        # Scores are deterministic per (student, reference) pair, so re-grading reuses them
+        self.score_cache_size = 4096
+        self._score_cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._score_cache_lock = threading.Lock()
+        
         self.threshold = threshold
         self.max_marks = max_marks
         self.model_name = "simple-text-similarity"
         
+        # Reference answers are the same for every student, so they are cleaned once
+        self.reference_cache_size = 1024
+        self._reference_cache: "OrderedDict[str, PreparedReference]" = OrderedDict()
+        self._reference_cache_lock = threading.Lock()
+        
         print(f"Initializing Simple SAS System - Threshold: {self.threshold}, Max marks: {self.max_marks}")
         print("SimpleSASEvaluator initialized successfully")
     
+    @property
+    def threshold(self) -> float:
+        """Minimum similarity for an answer to pass."""
+        return self._threshold
+    
+    @threshold.setter
+    def threshold(self, threshold: float):
+        # Assigning the attribute behaves like set_threshold: the score cache is
+        # dropped, so nothing computed under the previous threshold is reused
+        self._threshold = threshold
+        with self._score_cache_lock:
+            self._score_cache.clear()
+    
     def evaluate(self, student_answer: str, reference_answer: str) -> Dict[str, Any]:
         """
         Evaluate similarity between student and reference answers.
@@ -29,26 +130,31 @@ class SimpleSASEvaluator:
         Returns:
             Dictionary with evaluation results
         """
-        # Clean and normalize text
-        student_clean = self._clean_text(student_answer)
-        reference_clean = self._clean_text(reference_answer)
-        
-        # Check for very short or nonsensical answers
-        if len(student_clean) < 3:
-            return {
-                'score': 0.0,
-                'raw_score': 0.0,
-                'filtered': True,
-                'quality': 'Poor',
-                'details': {
-                    'reason': 'Answer too short',
-                    'category': 'Filtered',
-                    'model_name': self.model_name
-                }
-            }
+        score_key = self._score_key(student_answer, reference_answer)
+        similarity_score = self._get_cached_score(score_key)
         
-        # Compute similarity using multiple methods
-        similarity_score = self._compute_similarity(student_clean, reference_clean)
+        if similarity_score is None:
+            # Clean and normalize text
+            student = self._clean_and_tokenize(student_answer)
+            reference = self._prepare_reference(reference_answer)
+            
+            # Check for very short or nonsensical answers
+            if student[2] < 3:
+                return {
+                    'score': 0.0,
+                    'raw_score': 0.0,
+                    'filtered': True,
+                    'quality': 'Poor',
+                    'details': {
+                        'reason': 'Answer too short',
+                        'category': 'Filtered',
+                        'model_name': self.model_name
+                    }
+                }
+            
+            # Compute similarity using multiple methods
+            similarity_score = self._compute_similarity(student, reference)
+            self._store_cached_score(score_key, similarity_score)
         
         # Apply threshold filtering
         if similarity_score < self.threshold:
@@ -74,44 +180,150 @@ class SimpleSASEvaluator:
             }
         }
     
+    @staticmethod
+    def _score_key(student_answer: str, reference_answer: str) -> bytes:
+        """Cache key for a (student, reference) pair, without keeping the texts alive."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update((student_answer or '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update((reference_answer or '').encode('utf-8'))
+        return digest.digest()
+    
+    def _get_cached_score(self, key: bytes):
+        """Previously computed similarity for this pair, or None."""
+        with self._score_cache_lock:
+            score = self._score_cache.get(key)
+            if score is not None:
+                self._score_cache.move_to_end(key)
+            return score
+    
+    def _store_cached_score(self, key: bytes, score: float):
+        """Remember the similarity for this pair."""
+        with self._score_cache_lock:
+            self._score_cache[key] = score
+            while len(self._score_cache) > self.score_cache_size:
+                self._score_cache.popitem(last=False)
+    
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text for comparison."""
         if not text:
             return ""
         
+        if text.isascii():
+            if NUMBA_AVAILABLE:
+                return _clean_ascii_bytes(np.frombuffer(text.encode('ascii'), dtype=np.uint8)).tobytes().decode('ascii')
+            
+            # Same steps as below, in C: split/join strips and collapses whitespace, then
+            # punctuation is deleted (which can leave double spaces, exactly like the regexes)
+            return ' '.join(text.lower().split()).translate(_ASCII_PUNCTUATION_TABLE)
+        
         # Convert to lowercase
         text = text.lower().strip()
         
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         
         # Remove punctuation for better matching
-        text = re.sub(r'[^\w\s]', '', text)
+        text = _PUNCTUATION_RE.sub('', text)
         
         return text
     
-    def _compute_similarity(self, text1: str, text2: str) -> float:
-        """Compute similarity using multiple methods."""
+    def _clean_and_tokenize(self, text: str) -> CleanedText:
+        """Clean text and split it into words in one step, returning (cleaned, words, length)."""
+        cleaned = self._clean_text(text)
+        return cleaned, cleaned.split(), len(cleaned)
+    
+    def _prepare_reference(self, reference_answer: str) -> PreparedReference:
+        """Clean a reference answer and split it into words, reusing earlier results."""
+        with self._reference_cache_lock:
+            prepared = self._reference_cache.get(reference_answer)
+            if prepared is not None:
+                self._reference_cache.move_to_end(reference_answer)
+                return prepared
+        
+        cleaned, words, length = self._clean_and_tokenize(reference_answer)
+        words = frozenset(words)
+        # Bit positions are local to this reference, so they are evicted along with it
+        prepared = (cleaned, words, {word: 1 << i for i, word in enumerate(words)}, length)
+        
+        with self._reference_cache_lock:
+            self._reference_cache[reference_answer] = prepared
+            while len(self._reference_cache) > self.reference_cache_size:
+                self._reference_cache.popitem(last=False)
+        return prepared
+    
+    @staticmethod
+    def _word_mask(words, word_bits: Dict[str, int]) -> int:
+        """Bitmask of the reference words (word_bits) that occur in words."""
+        mask = 0
+        for word in words:
+            mask |= word_bits.get(word, 0)
+        return mask
+    
+    def passes_threshold(self, student_answer: str, reference_answer: str) -> bool:
+        """
+        Whether the answer clears the threshold (the opposite of evaluate()'s 'filtered').
+        
+        Cheaper than evaluate() when only the decision is needed: pairs whose score
+        provably falls below the threshold are rejected without running SequenceMatcher.
+        Their exact score is never computed, so nothing is cached for them.
+        """
+        score_key = self._score_key(student_answer, reference_answer)
+        similarity_score = self._get_cached_score(score_key)
+        
+        if similarity_score is None:
+            student = self._clean_and_tokenize(student_answer)
+            if student[2] < 3:
+                return False
+            
+            similarity_score = self._compute_similarity(student, self._prepare_reference(reference_answer), self.threshold)
+            if similarity_score is None:
+                return False
+            self._store_cached_score(score_key, similarity_score)
+        
+        return similarity_score >= self.threshold
+    
+    def _compute_similarity(self, student: CleanedText, reference: PreparedReference,
+                            threshold: Optional[float] = None) -> Optional[float]:
+        """
+        Compute similarity using multiple methods.
+        
+        Args:
+            student: Cleaned student answer (see _clean_and_tokenize)
+            reference: Prepared reference answer (see _prepare_reference)
+            threshold: If given, return None instead of the score when the pair
+                       provably scores below it
+        """
+        text1, words1, len1 = student
+        text2, words2, word_bits2, len2 = reference
         if not text1 or not text2:
             return 0.0
+        if text1 == text2:
+            return 1.0
         
-        # Method 1: Sequence matcher
-        seq_similarity = SequenceMatcher(None, text1, text2).ratio()
-        
-        # Method 2: Word overlap
-        words1 = set(text1.split())
-        words2 = set(text2.split())
+        # Method 3: Length similarity (penalize very different lengths)
+        length_similarity = min(len1, len2) / max(len1, len2)
         
-        if not words1 or not words2:
+        # Method 2: Word overlap (Jaccard); the shared words are the set bits of the student's mask
+        distinct_words1 = set(words1)
+        if not distinct_words1 or not words2:
             word_similarity = 0.0
         else:
-            intersection = words1.intersection(words2)
-            union = words1.union(words2)
-            word_similarity = len(intersection) / len(union) if union else 0.0
+            shared = _popcount(self._word_mask(distinct_words1, word_bits2))
+            word_similarity = shared / (len(distinct_words1) + len(words2) - shared)
         
-        # Method 3: Length similarity (penalize very different lengths)
-        len1, len2 = len(text1), len(text2)
-        length_similarity = min(len1, len2) / max(len1, len2) if max(len1, len2) > 0 else 0.0
+        if threshold is not None:
+            # Upper bound of the sequence similarity: at most `shorter` characters can match,
+            # and RapidFuzz's Indel similarity is tighter (with some slack for float rounding)
+            if RAPIDFUZZ_AVAILABLE:
+                seq_bound = Indel.normalized_similarity(text1, text2)
+            else:
+                seq_bound = 2 * min(len1, len2) / (len1 + len2)
+            if seq_bound * 0.5 + word_similarity * 0.3 + length_similarity * 0.2 < threshold - 1e-6:
+                return None
+        
+        # Method 1: Sequence similarity
+        seq_similarity = self._sequence_similarity(text1, text2)
         
         # Combine methods with weights
         combined_score = (
@@ -122,6 +334,75 @@ class SimpleSASEvaluator:
         
         return min(1.0, max(0.0, combined_score))
     
+    def similarity_matrix(self, student_answers: List[str], reference_answers: List[str]) -> np.ndarray:
+        """
+        Compute the similarity of every student answer against every reference answer.
+        
+        Same scores as evaluate()'s raw_score, but the word and length methods run
+        over the whole matrix at once instead of pair by pair.
+        
+        Args:
+            student_answers: List of student answers (rows)
+            reference_answers: List of reference answers (columns)
+            
+        Returns:
+            Array of shape (len(student_answers), len(reference_answers))
+        """
+        cleaned_students = [self._clean_and_tokenize(answer) for answer in student_answers]
+        students = [student[0] for student in cleaned_students]
+        references = [self._prepare_reference(answer) for answer in reference_answers]
+        reference_texts = [reference[0] for reference in references]
+        if not students or not references:
+            return np.zeros((len(students), len(references)), dtype=np.float32)
+        
+        # Method 2: Word overlap, as intersection / union sizes from word incidence matrices
+        student_words = [set(student[1]) for student in cleaned_students]
+        vocabulary = {word: i for i, word in enumerate(set().union(*student_words, *(r[1] for r in references)))}
+        student_incidence = self._word_incidence(student_words, vocabulary)
+        reference_incidence = self._word_incidence([r[1] for r in references], vocabulary)
+        intersection = student_incidence @ reference_incidence.T
+        union = student_incidence.sum(axis=1)[:, None] + reference_incidence.sum(axis=1)[None, :] - intersection
+        word_similarity = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+        
+        # Method 3: Length similarity
+        student_lengths = np.array([student[2] for student in cleaned_students], dtype=np.float32)[:, None]
+        reference_lengths = np.array([r[3] for r in references], dtype=np.float32)[None, :]
+        shorter = np.minimum(student_lengths, reference_lengths)
+        longer = np.maximum(student_lengths, reference_lengths)
+        length_similarity = np.divide(shorter, longer, out=np.zeros_like(shorter), where=longer > 0)
+        
+        # Method 1: Sequence similarity
+        seq_similarity = self._sequence_similarity_matrix(students, reference_texts)
+        
+        combined = seq_similarity * 0.5 + word_similarity * 0.3 + length_similarity * 0.2
+        np.clip(combined, 0.0, 1.0, out=combined)
+        
+        # Like _compute_similarity, an empty text scores 0 (identical texts already score 1)
+        combined[shorter == 0] = 0.0
+        return combined
+    
+    @staticmethod
+    def _word_incidence(word_sets: List[FrozenSet[str]], vocabulary: Dict[str, int]) -> np.ndarray:
+        """0/1 matrix marking which vocabulary words occur in each word set."""
+        incidence = np.zeros((len(word_sets), len(vocabulary)), dtype=np.float32)
+        for row, words in enumerate(word_sets):
+            incidence[row, [vocabulary[word] for word in words]] = 1.0
+        return incidence
+    
+    @staticmethod
+    def _sequence_similarity(text1: str, text2: str) -> float:
+        """Normalized character-level similarity of two texts (0-1)."""
+        return SequenceMatcher(None, text1, text2).ratio()
+    
+    @staticmethod
+    def _sequence_similarity_matrix(texts1: List[str], texts2: List[str]) -> np.ndarray:
+        """Sequence similarity of every text in texts1 (rows) against every text in texts2 (columns)."""
+        similarity = np.empty((len(texts1), len(texts2)), dtype=np.float32)
+        for row, text1 in enumerate(texts1):
+            for column, text2 in enumerate(texts2):
+                similarity[row, column] = SequenceMatcher(None, text1, text2).ratio()
+        return similarity
+    
     def _get_quality_label(self, raw_score: float) -> str:
         """Get quality label based on raw score."""
         if raw_score >= 0.8: